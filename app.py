@@ -2,6 +2,8 @@
 """
 REST API for Multilingual RAG System
 """
+import asyncio
+import json
 import os
 import sys
 import time
@@ -11,14 +13,13 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 import uvicorn
 
 from src.config.settings import get_settings
 from src.rag.pipeline import RAGPipeline
 from src.utils.logger import setup_logger
-from src.memory.memory_manager import get_memory_manager
 
 settings = get_settings()
 pipeline = None
@@ -34,7 +35,9 @@ async def lifespan(app: FastAPI):
     logger.info("Starting HSC Bangla RAG System for আপরিচিতা...")
     try:
         pipeline = RAGPipeline()
-        memory_manager = get_memory_manager()
+        # Share the pipeline's manager, created before the warm-up thread starts
+        memory_manager = pipeline.memory_manager
+        pipeline.warm_up()
         logger.info("RAG Pipeline and Memory Manager initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize RAG Pipeline: {e}")
@@ -97,6 +100,7 @@ class SystemStats(BaseModel):
     pipeline_ready: bool
     last_query_time: Optional[str]
     memory_stats: Optional[Dict[str, Any]] = None
+    cache_stats: Optional[Dict[str, Any]] = None
 
 class SessionStats(BaseModel):
     """Session statistics response"""
@@ -161,12 +165,15 @@ async def get_stats():
     if memory_manager:
         memory_stats = memory_manager.get_global_stats()
     
+    cache_stats = pipeline.get_cache_stats() if pipeline else None
+    
     return SystemStats(
         total_queries=stats["total_queries"],
         avg_response_time=round(avg_time, 3),
         pipeline_ready=pipeline is not None,
         last_query_time=stats["last_query_time"],
-        memory_stats=memory_stats
+        memory_stats=memory_stats,
+        cache_stats=cache_stats
     )
 
 @app.post("/session/create")
@@ -241,18 +248,18 @@ async def process_query(request: QueryRequest):
     if pipeline is None:
         raise HTTPException(status_code=503, detail="RAG Pipeline is not ready")
     
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     try:
         logger.info(f"Processing query: {request.query[:50]}...")
         
-        response = pipeline.process_query(
+        response = await pipeline.aprocess_query(
             request.query, 
             k=request.k, 
             session_id=request.session_id
         )
         
-        end_time = time.time()
+        end_time = time.perf_counter()
         response_time = end_time - start_time
         
         stats["total_queries"] += 1
@@ -275,7 +282,7 @@ async def process_query(request: QueryRequest):
         )
         
     except Exception as e:
-        end_time = time.time()
+        end_time = time.perf_counter()
         response_time = end_time - start_time
         
         logger.error(f"Error processing query: {e}")
@@ -301,13 +308,13 @@ async def chat_endpoint(request: QueryRequest):
         )
     
     try:
-        start_time = time.time()
-        response = pipeline.process_query(
+        start_time = time.perf_counter()
+        response = await pipeline.aprocess_query(
             request.query, 
             k=request.k, 
             session_id=request.session_id
         )
-        end_time = time.time()
+        end_time = time.perf_counter()
         
         return {
             "answer": response.get("answer", "Sorry, I couldn't process your question."),
@@ -325,6 +332,62 @@ async def chat_endpoint(request: QueryRequest):
             content={"error": "Sorry, there was an error processing your message."}
         )
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: QueryRequest):
+    """
+    Chat endpoint that streams the answer as newline-delimited JSON
+    
+    Emits {"delta": ...} lines while Gemini generates, then one {"done": true, ...}
+    line with the same fields as /chat. Cached and memory answers arrive only in
+    the final line. A failed request's final line carries "error"; if deltas were
+    already sent it also carries "reset": true and the streamed text should be discarded.
+    """
+    global pipeline, logger
+    
+    if pipeline is None:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "System is not ready. Please try again later."}
+        )
+    
+    start_time = time.perf_counter()
+    deltas: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+    task = asyncio.create_task(pipeline.aprocess_query(
+        request.query,
+        k=request.k,
+        session_id=request.session_id,
+        on_text=deltas.put_nowait
+    ))
+    task.add_done_callback(lambda _: deltas.put_nowait(None))
+    
+    async def events():
+        streamed = False
+        while (text := await deltas.get()) is not None:
+            streamed = True
+            yield json.dumps({"delta": text}, ensure_ascii=False) + "\n"
+        
+        try:
+            response = task.result()
+            final = {
+                "done": True,
+                "answer": response.get("answer", "Sorry, I couldn't process your question."),
+                "language": response.get("language", "unknown"),
+                "confidence": response.get("confidence", 0.0),
+                "response_time": round(time.perf_counter() - start_time, 2),
+                "sources_count": len(response.get("sources", [])),
+                "session_id": response.get("pipeline_info", {}).get("session_id")
+            }
+            if "error" in response:
+                final["error"] = final["answer"]
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}")
+            final = {"done": True, "error": "Sorry, there was an error processing your message."}
+        if streamed and "error" in final:
+            final["reset"] = True
+        yield json.dumps(final, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
 @app.exception_handler(422)
 async def validation_exception_handler(request: Request, exc):
     """Handle validation errors"""
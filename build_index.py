@@ -7,10 +7,12 @@ import os
 import sys
 import time
 from datetime import datetime
+from pathlib import Path
 
-# Add project root to path
-project_root = "/home/tamjid/Codes/Projects/Multilingual_RAG_SYSTEM_10MS"
-sys.path.insert(0, project_root)
+# Add project root (this script's directory) to path
+project_root = Path(__file__).resolve().parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
 
 from src.knowledge_base.indexer import KnowledgeBaseIndexer
 
@@ -31,7 +33,7 @@ def main():
         print("\n🔧 Initializing indexer...")
         indexer = KnowledgeBaseIndexer()
         
-        base_path = "/home/tamjid/Codes/Projects/Multilingual_RAG_SYSTEM_10MS/processed_documents"
+        base_path = str(project_root / "processed_documents")
         
         print("📁 Processing separated content files:")
         print("   ✓ mcq_content.txt")
@@ -7,9 +7,9 @@ __version__ = "0.1.0"
 __author__ = "Your Name"
 __email__ = "your.email@example.com"
 
-from .config.settings import Settings
+from .config.settings import get_settings
 
-# Initialize global settings instance
-settings = Settings()
+# Share the process-wide settings singleton instead of parsing .env again
+settings = get_settings()
 
 __all__ = ["settings"]
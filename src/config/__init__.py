@@ -2,6 +2,6 @@
 Configuration package for the Multilingual RAG System
 """
 
-from .settings import Settings
+from .settings import Settings, get_settings
 
-__all__ = ["Settings"]
+__all__ = ["Settings", "get_settings"]
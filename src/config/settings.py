@@ -35,6 +35,15 @@ class Settings:
         self.chroma_db_path: str = os.getenv("CHROMA_DB_PATH", "./data/chroma_db")
         self.collection_name: str = os.getenv("COLLECTION_NAME", "hsc_bangla_documents")
         
+        # HNSW index tuning (applied when the collection is created)
+        self.hnsw_m: int = int(os.getenv("HNSW_M", "32"))
+        self.hnsw_construction_ef: int = int(os.getenv("HNSW_CONSTRUCTION_EF", "200"))
+        self.hnsw_search_ef: int = int(os.getenv("HNSW_SEARCH_EF", "64"))
+        
+        # Response caching (semantic tier matches paraphrases by cosine similarity)
+        self.semantic_cache_size: int = int(os.getenv("SEMANTIC_CACHE_SIZE", "1024"))
+        self.semantic_cache_threshold: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.93"))
+        
         # Embedding Configuration
         self.embedding_dimension: int = int(os.getenv("EMBEDDING_DIMENSION", "768"))
         self.chunk_size: int = int(os.getenv("CHUNK_SIZE", "512"))
@@ -84,6 +93,9 @@ class Settings:
         return {
             "path": str(self.chroma_db_path),
             "collection_name": self.collection_name,
+            "hnsw_m": self.hnsw_m,
+            "hnsw_construction_ef": self.hnsw_construction_ef,
+            "hnsw_search_ef": self.hnsw_search_ef,
         }
     
     def get_embedding_config(self) -> dict:
@@ -4,18 +4,54 @@ Uses Gemini 2.5 Pro for high-quality OCR with strict rate limiting.
 """
 
 import base64
+import io
+import os
 import time
 import logging
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 import fitz  # PyMuPDF - only for page splitting, not text extraction
 import google.generativeai as genai
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
+from PIL import Image
+from src.utils.hashing import hash_bytes
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 2x zoom for better OCR quality; built once per process, Matrix is immutable here
+_ZOOM = fitz.Matrix(2.0, 2.0)
+
+def _render_pages(job: Tuple[str, int, int]) -> List[Tuple[int, bytes]]:
+    """
+    Render a contiguous 0-based page range [first, last) of a PDF to JPEG bytes.
+    
+    Module-level so it can run in a worker process; each worker opens the
+    document once for its whole range.
+    """
+    pdf_path, first, last = job
+    doc = fitz.open(pdf_path)
+    images = []
+    
+    try:
+        for page_num in range(first, last):
+            page = doc.load_page(page_num)
+            pix = page.get_pixmap(matrix=_ZOOM, alpha=False)
+            
+            # Encode the raw RGB samples straight to JPEG (much cheaper than PNG)
+            img = Image.frombuffer("RGB", (pix.width, pix.height), pix.samples, "raw", "RGB", pix.stride, 1)
+            buf = io.BytesIO()
+            img.save(buf, "JPEG", quality=90, optimize=False)
+            images.append((page_num + 1, buf.getvalue()))
+    finally:
+        doc.close()
+    
+    return images
+
 class RateLimiter:
     """Rate limiter for Gemini API calls with strict limits."""
     
@@ -31,50 +67,55 @@ class RateLimiter:
             }
         }
         
-        self.request_times = []
+        self.request_times = deque()
         self.daily_requests = 0
         self.token_count = 0
-        self.token_reset_time = time.time()
+        self.token_reset_time = time.monotonic()
+        
+        # Guards limiter state so concurrent workers can share one limiter
+        self._lock = threading.Lock()
         
     def wait_if_needed(self, estimated_tokens: int = 0):
         """Wait if rate limits would be exceeded."""
-        current_time = time.time()
-        
-        # Clean old request times (older than 1 minute)
-        self.request_times = [t for t in self.request_times if current_time - t < 60]
-        
-        # Reset token count if more than 1 minute passed
-        if current_time - self.token_reset_time > 60:
-            self.token_count = 0
-            self.token_reset_time = current_time
-        
-        limits = self.limits.get(self.model_name, self.limits["gemini-2.5-pro"])
-        
-        # Check RPM limit
-        if len(self.request_times) >= limits["rpm"]:
-            wait_time = 60 - (current_time - self.request_times[0]) + 1
-            if wait_time > 0:
-                logger.info(f"RPM limit reached. Waiting {wait_time:.1f} seconds...")
-                time.sleep(wait_time)
-        
-        # Check TPM limit
-        if self.token_count + estimated_tokens > limits["tpm"]:
-            wait_time = 61 - (current_time - self.token_reset_time)
-            if wait_time > 0:
-                logger.info(f"TPM limit would be exceeded. Waiting {wait_time:.1f} seconds...")
-                time.sleep(wait_time)
+        with self._lock:
+            current_time = time.monotonic()
+            
+            # Clean old request times (older than 1 minute)
+            while self.request_times and current_time - self.request_times[0] >= 60:
+                self.request_times.popleft()
+            
+            # Reset token count if more than 1 minute passed
+            if current_time - self.token_reset_time > 60:
                 self.token_count = 0
-                self.token_reset_time = time.time()
-        
-        # Check RPD limit
-        if self.daily_requests >= limits["rpd"]:
-            logger.error(f"Daily request limit ({limits['rpd']}) reached!")
-            raise Exception(f"Daily request limit reached for {self.model_name}")
-        
-        # Record this request
-        self.request_times.append(time.time())
-        self.daily_requests += 1
-        self.token_count += estimated_tokens
+                self.token_reset_time = current_time
+            
+            limits = self.limits.get(self.model_name, self.limits["gemini-2.5-pro"])
+            
+            # Check RPM limit
+            if len(self.request_times) >= limits["rpm"]:
+                wait_time = 60 - (current_time - self.request_times[0]) + 1
+                if wait_time > 0:
+                    logger.info(f"RPM limit reached. Waiting {wait_time:.1f} seconds...")
+                    time.sleep(wait_time)
+            
+            # Check TPM limit
+            if self.token_count + estimated_tokens > limits["tpm"]:
+                wait_time = 61 - (current_time - self.token_reset_time)
+                if wait_time > 0:
+                    logger.info(f"TPM limit would be exceeded. Waiting {wait_time:.1f} seconds...")
+                    time.sleep(wait_time)
+                    self.token_count = 0
+                    self.token_reset_time = time.monotonic()
+            
+            # Check RPD limit
+            if self.daily_requests >= limits["rpd"]:
+                logger.error(f"Daily request limit ({limits['rpd']}) reached!")
+                raise Exception(f"Daily request limit reached for {self.model_name}")
+            
+            # Record this request
+            self.request_times.append(time.monotonic())
+            self.daily_requests += 1
+            self.token_count += estimated_tokens
 
 class GeminiOCRProcessor:
     """OCR-based PDF processor using Gemini models."""
@@ -99,28 +140,55 @@ class GeminiOCRProcessor:
         # Rate limiter for OCR model
         self.ocr_limiter = RateLimiter("gemini-2.5-pro")
         
+        # Pages per shard when no explicit page ranges are given
+        self.shard_size = 50
+        
+        # Processes rendering page images in parallel (rendering is CPU-bound),
+        # and pages per render job; small jobs let OCR start on the first pages early
+        self.render_workers = min(4, os.cpu_count() or 1)
+        self.render_batch_size = 4
+        
+        # Pages OCR'd concurrently within a shard; the shared rate limiter
+        # still caps the request rate, this only overlaps request latency
+        self.ocr_workers = 4
+        
         logger.info("Gemini OCR Processor initialized")
     
-    def _pdf_to_images(self, pdf_path: str) -> List[Tuple[int, bytes]]:
-        """Convert PDF pages to image bytes."""
+    def _compute_shards(self, total_pages: int) -> List[Tuple[int, int]]:
+        """Split a document into inclusive 1-based page ranges of shard_size pages."""
+        return [
+            (start, min(start + self.shard_size - 1, total_pages))
+            for start in range(1, total_pages + 1, self.shard_size)
+        ]
+    
+    def _iter_page_images(self, pdf_path: str, start_page: int = 1, 
+                          end_page: Optional[int] = None) -> Iterator[List[Tuple[int, bytes]]]:
+        """
+        Render PDF pages (inclusive 1-based range, default all) to image bytes.
+        
+        Yields batches of render_batch_size pages in page order as soon as each
+        batch is ready, so callers can start OCR while later pages still render.
+        """
         logger.info(f"Converting PDF to images: {pdf_path}")
         
         doc = fitz.open(pdf_path)
-        images = []
+        end_page = min(end_page or len(doc), len(doc))
+        doc.close()
+        if end_page < start_page:
+            return
         
-        for page_num in range(len(doc)):
-            page = doc.load_page(page_num)
-            
-            # Convert to image with high DPI for better OCR
-            mat = fitz.Matrix(2.0, 2.0)  # 2x zoom for better quality
-            pix = page.get_pixmap(matrix=mat)
-            img_data = pix.tobytes("png")
-            
-            images.append((page_num + 1, img_data))
-            logger.info(f"Converted page {page_num + 1} to image")
+        # Small contiguous batches spread over the workers
+        first = start_page - 1
+        step = self.render_batch_size
+        jobs = [(pdf_path, lo, min(lo + step, end_page)) for lo in range(first, end_page, step)]
         
-        doc.close()
-        return images
+        if len(jobs) > 1 and self.render_workers > 1:
+            with ProcessPoolExecutor(max_workers=min(self.render_workers, len(jobs))) as executor:
+                yield from executor.map(_render_pages, jobs)
+        else:
+            yield from map(_render_pages, jobs)
+        
+        logger.info(f"Converted {end_page - first} pages to images")
     
     def _ocr_page(self, page_num: int, image_data: bytes) -> str:
         """OCR a single page using Gemini 2.5 Pro."""
@@ -151,7 +219,7 @@ class GeminiOCRProcessor:
             response = self.ocr_model.generate_content([
                 prompt,
                 {
-                    "mime_type": "image/png",
+                    "mime_type": "image/jpeg",
                     "data": image_b64
                 }
             ])
@@ -165,31 +233,92 @@ class GeminiOCRProcessor:
             logger.error(f"Error OCRing page {page_num}: {str(e)}")
             return f"[OCR Error on page {page_num}: {str(e)}]"
     
+    def _ocr_page_cached(self, page_num: int, image_data: bytes, cache_dir: Path) -> str:
+        """OCR a single page, reusing cached text for identical page images."""
+        cache_file = cache_dir / f"{hash_bytes(image_data)}.txt"
+        
+        if cache_file.exists():
+            logger.info(f"Using cached OCR for page {page_num}")
+            return cache_file.read_text(encoding='utf-8')
+        
+        page_text = self._ocr_page(page_num, image_data)
+        
+        # Only cache successful OCR so failed pages are retried on the next run
+        if not page_text.startswith("[OCR Error"):
+            cache_file.write_text(page_text, encoding='utf-8')
+        
+        return page_text
 
 
     
-    def process_pdf(self, pdf_path: str, output_dir: str = "processed_documents") -> Dict[str, Any]:
-        """Main method to process PDF using OCR - simplified to only generate raw OCR output."""
-        start_time = time.time()
+    def process_shard(self, pdf_path: str, start_page: int, end_page: int,
+                      output_dir: str = "processed_documents") -> str:
+        """
+        OCR one page range of a PDF and save it as raw_ocr_output_{start}_{end}.txt.
+        
+        Independent shards can be run by separate processes (or machines), each
+        with its own GeminiOCRProcessor and API key, since limits are per key.
+        """
+        output_path = Path(output_dir)
+        cache_dir = output_path / "ocr_cache"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        def ocr_one(page_num: int, image_data: bytes) -> str:
+            logger.info(f"OCRing page {page_num} (shard {start_page}-{end_page})")
+            return self._ocr_page_cached(page_num, image_data, cache_dir)
+        
+        # Submit each page for OCR as soon as its render batch is ready, so rendering
+        # overlaps OCR; futures are kept in page order regardless of completion order
+        with ThreadPoolExecutor(max_workers=self.ocr_workers) as executor:
+            pending = [
+                (page_num, executor.submit(ocr_one, page_num, image_data))
+                for batch in self._iter_page_images(pdf_path, start_page, end_page)
+                for page_num, image_data in batch
+            ]
+            all_text = [
+                f"\n--- PAGE {page_num} ---\n{future.result()}"
+                for page_num, future in pending
+            ]
+        
+        shard_text = "\n".join(all_text)
+        
+        shard_output_path = output_path / f"raw_ocr_output_{start_page}_{end_page}.txt"
+        with open(shard_output_path, 'w', encoding='utf-8') as f:
+            f.write(shard_text)
+        
+        logger.info(f"Shard {start_page}-{end_page} saved to {shard_output_path}")
+        return shard_text
+    
+    def process_pdf(self, pdf_path: str, output_dir: str = "processed_documents",
+                    page_ranges: Optional[List[Tuple[int, int]]] = None) -> Dict[str, Any]:
+        """
+        Main method to process PDF using OCR - simplified to only generate raw OCR output.
+        
+        The PDF is processed in page-range shards (shard_size pages each unless
+        page_ranges is given), so a failure only loses the shard in progress.
+        """
+        start_time = time.perf_counter()
         
         # Create output directory
         Path(output_dir).mkdir(exist_ok=True)
         
         logger.info(f"Starting OCR processing of {pdf_path}")
         
-        # Step 1: Convert PDF to images
-        images = self._pdf_to_images(pdf_path)
+        doc = fitz.open(pdf_path)
+        doc_pages = len(doc)
+        doc.close()
+        if page_ranges is None:
+            page_ranges = self._compute_shards(doc_pages)
         
-        # Step 2: OCR each page with Gemini 2.5 Pro
-        all_text = []
-        for page_num, image_data in images:
-            logger.info(f"OCRing page {page_num}/{len(images)}")
-            page_text = self._ocr_page(page_num, image_data)
-            all_text.append(f"\n--- PAGE {page_num} ---\n{page_text}")
+        # OCR each shard with Gemini 2.5 Pro
+        shard_texts = []
+        for start_page, end_page in page_ranges:
+            logger.info(f"Processing shard: pages {start_page}-{end_page}")
+            shard_texts.append(self.process_shard(pdf_path, start_page, end_page, output_dir))
         
-        full_text = "\n".join(all_text)
+        full_text = "\n".join(shard_texts)
         
-        # Save raw OCR output
+        # Save combined raw OCR output
         raw_output_path = Path(output_dir) / "raw_ocr_output.txt"
         with open(raw_output_path, 'w', encoding='utf-8') as f:
             f.write(full_text)
@@ -198,15 +327,16 @@ class GeminiOCRProcessor:
         
         # Prepare return metadata
         processing_metadata = {
-            "total_pages": len(images),
-            "processing_time_seconds": time.time() - start_time,
+            "total_pages": sum(max(0, min(end, doc_pages) - start + 1) for start, end in page_ranges),
+            "processing_time_seconds": time.perf_counter() - start_time,
             "total_characters": len(full_text),
             "models_used": ["gemini-2.5-pro"],
             "source_file": pdf_path,
-            "output_file": str(raw_output_path)
+            "output_file": str(raw_output_path),
+            "shards": [f"{start}-{end}" for start, end in page_ranges]
         }
         
-        processing_time = time.time() - start_time
+        processing_time = time.perf_counter() - start_time
         logger.info(f"OCR processing completed in {processing_time:.2f} seconds")
         
         return {
@@ -217,7 +347,6 @@ class GeminiOCRProcessor:
 
 
 if __name__ == "__main__":
-    import os
     from dotenv import load_dotenv
     
     load_dotenv()
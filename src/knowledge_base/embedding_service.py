@@ -4,6 +4,7 @@ Embedding service using Gemini embedding model with smart rate limiting
 import time
 import random
 from typing import List, Dict, Any
+import numpy as np
 import google.generativeai as genai
 from src.config.settings import get_settings
 from src.utils.logger import setup_logger
@@ -25,8 +26,9 @@ class EmbeddingService:
         self.base_delay = 2.0   # 2 seconds = 30 RPM (well under 100 RPM limit)
         self.max_delay = 120.0  # 2 minutes maximum delay
         self.retry_attempts = 3  # Reduced retries to avoid quota waste
+        self.query_batch_size = 100  # Maximum contents per batched embed request
         
-    def generate_embeddings(self, texts: List[str], task_type: str = "RETRIEVAL_DOCUMENT") -> List[List[float]]:
+    def generate_embeddings(self, texts: List[str], task_type: str = "RETRIEVAL_DOCUMENT") -> np.ndarray:
         """
         Generate embeddings for a list of texts with smart rate limiting
         
@@ -35,9 +37,9 @@ class EmbeddingService:
             task_type: Type of embedding task (RETRIEVAL_DOCUMENT, QUESTION_ANSWERING, etc.)
             
         Returns:
-            List of embedding vectors
+            float32 array of shape (len(texts), embedding_dimension)
         """
-        embeddings = []
+        embeddings = np.empty((len(texts), self.settings.embedding_dimension), dtype=np.float32)
         self.logger.info(f"Starting embedding generation for {len(texts)} texts with rate limiting")
         
         for i, text in enumerate(texts):
@@ -54,10 +56,11 @@ class EmbeddingService:
                     embedding = genai.embed_content(
                         model=f"models/{self.model}",
                         content=text,
-                        task_type=task_type
+                        task_type=task_type,
+                        output_dimensionality=self.settings.embedding_dimension
                     )
                     
-                    embeddings.append(embedding['embedding'])
+                    embeddings[i] = np.asarray(embedding['embedding'], dtype=np.float32)
                     success = True
                     
                     if (i + 1) % 25 == 0:
@@ -78,21 +81,29 @@ class EmbeddingService:
             if not success:
                 self.logger.error(f"Failed to generate embedding for text {i + 1} after {self.retry_attempts} attempts")
                 # Add zero vector as fallback
-                embeddings.append([0.0] * self.settings.embedding_dimension)
+                embeddings[i] = 0.0
         
-        self.logger.info(f"Completed embedding generation: {len([e for e in embeddings if sum(e) != 0])}/{len(texts)} successful")
+        successful = int(np.count_nonzero(embeddings.any(axis=1)))
+        self.logger.info(f"Completed embedding generation: {successful}/{len(texts)} successful")
+        
+        # L2-normalize once at ingest so similarity search is a plain dot product
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.divide(embeddings, norms, out=embeddings, where=norms > 0)
         return embeddings
     
-    def generate_query_embedding(self, query: str) -> List[float]:
-        """Generate embedding for a single query with retry logic"""
+    def generate_query_embedding(self, query: str) -> np.ndarray:
+        """Generate an L2-normalized float32 embedding for a single query with retry logic"""
         for attempt in range(self.retry_attempts):
             try:
                 embedding = genai.embed_content(
                     model=f"models/{self.model}",
                     content=query,
-                    task_type="QUESTION_ANSWERING"
+                    task_type="QUESTION_ANSWERING",
+                    output_dimensionality=self.settings.embedding_dimension
                 )
-                return embedding['embedding']
+                vector = np.asarray(embedding['embedding'], dtype=np.float32)
+                norm = np.linalg.norm(vector)
+                return vector / norm if norm > 0 else vector
             except Exception as e:
                 if "429" in str(e) or "quota" in str(e).lower():
                     backoff_delay = min(self.max_delay, self.base_delay * (2 ** attempt))
@@ -103,4 +114,44 @@ class EmbeddingService:
                     break
         
         self.logger.error("Failed to generate query embedding after retries")
-        return [0.0] * self.settings.embedding_dimension
+        return np.zeros(self.settings.embedding_dimension, dtype=np.float32)
+    
+    def generate_query_embeddings(self, queries: List[str]) -> np.ndarray:
+        """
+        Generate L2-normalized query embeddings for many queries in batched requests
+        
+        Args:
+            queries: List of query strings
+            
+        Returns:
+            float32 array of shape (len(queries), embedding_dimension); rows
+            whose batch failed after retries are zero vectors
+        """
+        embeddings = np.zeros((len(queries), self.settings.embedding_dimension), dtype=np.float32)
+        
+        for start in range(0, len(queries), self.query_batch_size):
+            batch = queries[start:start + self.query_batch_size]
+            for attempt in range(self.retry_attempts):
+                try:
+                    result = genai.embed_content(
+                        model=f"models/{self.model}",
+                        content=batch,
+                        task_type="QUESTION_ANSWERING",
+                        output_dimensionality=self.settings.embedding_dimension
+                    )
+                    embeddings[start:start + len(batch)] = np.asarray(result['embedding'], dtype=np.float32)
+                    break
+                except Exception as e:
+                    if "429" in str(e) or "quota" in str(e).lower():
+                        backoff_delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                        self.logger.warning(f"Rate limit on query embedding batch, waiting {backoff_delay:.1f}s...")
+                        time.sleep(backoff_delay)
+                    else:
+                        self.logger.error(f"Error generating query embeddings: {e}")
+                        break
+            else:
+                self.logger.error("Failed to generate query embedding batch after retries")
+        
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        return embeddings
@@ -2,6 +2,7 @@
 Knowledge base indexer - orchestrates the entire indexing process
 """
 import os
+from itertools import islice
 from typing import List
 from src.config.settings import get_settings
 from src.utils.logger import setup_logger
@@ -21,6 +22,9 @@ class KnowledgeBaseIndexer:
         self.chunker = SmartContentChunker()
         self.embedding_service = EmbeddingService()
         self.vector_store = VectorStore()
+        
+        # Chunks embedded and stored per round trip
+        self.batch_size = 64
     
     def index_documents(self, base_path: str) -> None:
         """
@@ -34,25 +38,36 @@ class KnowledgeBaseIndexer:
         
         self.logger.info(f"Starting enhanced indexing process for: {base_path}")
         
-        # Step 1: Process separated content files with smart chunking
+        # Files are chunked in worker processes and their chunks embedded/stored in
+        # mini-batches as each file arrives, so the embedding matrix is never held at once
         self.logger.info("Processing separated content with smart chunking...")
-        chunks = self.chunker.chunk_separated_content_only(base_path)
-        self.logger.info(f"Created {len(chunks)} optimized chunks with content-aware algorithms")
+        chunks = self.chunker.iter_chunks(base_path)
+        total = 0
         
-        if not chunks:
+        while True:
+            batch = list(islice(chunks, self.batch_size))
+            if not batch:
+                break
+            
+            # Generate embeddings for this mini-batch
+            chunk_texts = [chunk.text for chunk in batch]
+            embeddings = self.embedding_service.generate_embeddings(chunk_texts)
+            
+            # Store in vector database, keyed by the stable chunk IDs
+            self.vector_store.add_documents(
+                chunk_texts,
+                embeddings,
+                metadatas=[chunk.metadata for chunk in batch],
+                ids=[chunk.chunk_id for chunk in batch]
+            )
+            
+            total += len(batch)
+            self.logger.info(f"Indexed {total} chunks so far")
+        
+        if not total:
             self.logger.warning("No chunks created from documents")
             return
         
-        # Step 2: Generate embeddings (without rate limiting)
-        self.logger.info("Generating embeddings at full speed...")
-        chunk_texts = [chunk.text for chunk in chunks]
-        embeddings = self.embedding_service.generate_embeddings(chunk_texts)
-        self.logger.info(f"Generated {len(embeddings)} embeddings")
-        
-        # Step 3: Store in vector database
-        self.logger.info("Storing in vector database...")
-        self.vector_store.add_documents(chunks, embeddings)
-        
         self.logger.info("Smart content-aware indexing completed successfully")
     
     def rebuild_index(self, base_path: str) -> None:
@@ -82,7 +97,7 @@ def main():
     indexer = KnowledgeBaseIndexer()
     
     # Path to the processed documents directory
-    base_path = "/home/tamjid/Codes/Projects/Multilingual_RAG_SYSTEM_10MS/processed_documents"
+    base_path = str(indexer.settings.PROJECT_ROOT / "processed_documents")
     
     try:
         indexer.rebuild_index(base_path)
@@ -3,12 +3,118 @@ Smart content-aware chunker with optimized chunk sizes for different content typ
 """
 import re
 import os
-from typing import List, Dict, Any, Tuple
+import sys
+import hashlib
+from types import MappingProxyType
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, Iterable, Iterator, Union
 from dataclasses import dataclass
+import numpy as np
 from src.config.settings import get_settings
 
+# Precompiled patterns used on every chunk
+# Single-pass cleaner: whitespace runs | markdown bold
+_CLEAN_RE = re.compile(r'(\s+)|(\*\*.*?\*\*)', re.DOTALL)
+# 📖 🎯 ✓ markers are deleted with a translation table before the regex pass
+_STRIP_TBL = str.maketrans('', '', '\U0001F4D6\U0001F3AF\u2713')
+_MCQ_SPLIT_RE = re.compile(r'\n\n+|(?=\d+[।.])')
+_PARA_RE = re.compile(r'\n\n+')
+_CREATIVE_SEP_RE = re.compile(r'---')
+_SENT_RE = re.compile(r'[।॥]|\n\n+')  # danda, double danda, paragraph break
+_QNUM_RE = re.compile(r'(\d+)')
 
-@dataclass
+
+def _clean_sub(match: re.Match) -> str:
+    """Collapse whitespace runs to a space and drop markdown bold"""
+    return ' ' if match.group(1) is not None else ''
+
+
+def _short_digest(*pieces: str) -> 'hashlib.blake2b':
+    """Start a short, deterministic BLAKE2b digest for chunk IDs, seeded with pieces"""
+    hasher = hashlib.blake2b(digest_size=4)
+    for piece in pieces:
+        hasher.update(piece.encode('utf-8'))
+    return hasher
+
+
+def _iter_sections(file_path: str, sep: 're.Pattern', read_size: int = 65536) -> Iterator[str]:
+    """
+    Stream a UTF-8 text file as sections split on a separator pattern
+    
+    The file is read in text mode, so CRLF and CR line endings arrive as '\\n'.
+    Only the unmatched tail is kept between reads, so memory stays proportional
+    to the largest section rather than the whole file. A separator match that
+    touches the end of the buffer is deferred to the next read, since more of it
+    (e.g. another blank line) may follow.
+    
+    Args:
+        file_path: Path to the text file
+        sep: Compiled separator pattern (e.g. _PARA_RE or _CREATIVE_SEP_RE)
+        read_size: Characters to read per call
+        
+    Yields:
+        Sections (unstripped, possibly empty)
+    """
+    with open(file_path, 'r', encoding='utf-8', newline=None) as f:
+        # Small files fit in a single read: split in C and skip the buffer bookkeeping
+        if os.path.getsize(file_path) <= read_size:
+            sections = sep.split(f.read())
+            if not sections[-1]:
+                sections.pop()
+            yield from sections
+            return
+        
+        pending = ""
+        while True:
+            data = f.read(read_size)
+            pending += data
+            
+            start = 0
+            for match in sep.finditer(pending):
+                if data and match.end() == len(pending):
+                    break
+                yield pending[start:match.start()]
+                start = match.end()
+            pending = pending[start:]
+            
+            if not data:
+                break
+    
+    if pending:
+        yield pending
+
+
+def _iter_sentence_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) offsets of the sentences in text, scanning it once"""
+    start = 0
+    for match in _SENT_RE.finditer(text):
+        yield start, match.start()
+        start = match.end()
+    yield start, len(text)
+
+
+def _overlap_window(pieces: List[str], overlap: int) -> Tuple[int, int]:
+    """
+    Find the overlap window of whole pieces carried into the next chunk
+    
+    Walks back from the newest piece while the window stays within `overlap`
+    characters, so the cost depends on the window size, not the buffer size. The
+    whole buffer is never reused.
+    
+    Returns:
+        (start index into pieces, total length of pieces[start:]);
+        start == len(pieces) means no overlap
+    """
+    start = len(pieces)
+    tail_len = 0
+    while start > 1 and tail_len + len(pieces[start - 1]) <= overlap:
+        start -= 1
+        tail_len += len(pieces[start])
+    return start, tail_len
+
+
+@dataclass(slots=True)
 class DocumentChunk:
     text: str
     metadata: Dict[str, Any]
@@ -17,42 +123,98 @@ class DocumentChunk:
     content_type: str = "general"
 
 
+# Content types stored as uint8 codes in ChunkBatch
+CONTENT_TYPES = ('mcq', 'creative', 'table', 'general', 'raw')
+_CONTENT_TYPE_CODES = {name: code for code, name in enumerate(CONTENT_TYPES)}
+
+
+class ChunkBatch:
+    """
+    Columnar (structure-of-arrays) store for chunks
+    
+    Keeps one list/array per field instead of one DocumentChunk object per
+    chunk, so indexing and statistics sweep contiguous columns.
+    """
+    
+    __slots__ = ('texts', 'chunk_ids', 'metadatas', 'content_types', 'page_numbers', 'source_files')
+    
+    def __init__(self):
+        self.texts: List[str] = []
+        self.chunk_ids: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.content_types = array('B')   # codes into CONTENT_TYPES
+        self.page_numbers = array('i')    # -1 when unknown
+        self.source_files: List[str] = []
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+    
+    def __iter__(self) -> Iterator[DocumentChunk]:
+        """Iterate as DocumentChunk objects for call sites that need them"""
+        for i in range(len(self.texts)):
+            page_number = self.page_numbers[i]
+            yield DocumentChunk(
+                text=self.texts[i],
+                metadata=self.metadatas[i],
+                chunk_id=self.chunk_ids[i],
+                page_number=page_number if page_number >= 0 else None,
+                content_type=CONTENT_TYPES[self.content_types[i]]
+            )
+    
+    def append(self, text: str, chunk_id: str, metadata: Dict[str, Any],
+               content_type: str = "general", page_number: int = None) -> None:
+        """Append one chunk's fields to the columns"""
+        self.texts.append(text)
+        self.chunk_ids.append(chunk_id)
+        self.metadatas.append(metadata)
+        self.content_types.append(_CONTENT_TYPE_CODES[content_type])
+        self.page_numbers.append(-1 if page_number is None else page_number)
+        self.source_files.append(sys.intern(metadata.get('source_file', '')))
+    
+    def extend(self, other: 'ChunkBatch') -> None:
+        """Append all chunks of another batch"""
+        self.texts.extend(other.texts)
+        self.chunk_ids.extend(other.chunk_ids)
+        self.metadatas.extend(other.metadatas)
+        self.content_types.extend(other.content_types)
+        self.page_numbers.extend(other.page_numbers)
+        self.source_files.extend(other.source_files)
+    
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[DocumentChunk]) -> 'ChunkBatch':
+        """Build a batch from DocumentChunk objects"""
+        batch = cls()
+        for chunk in chunks:
+            batch.append(chunk.text, chunk.chunk_id, chunk.metadata, chunk.content_type, chunk.page_number)
+        return batch
+
+
 class SmartContentChunker:
     """Smart chunker with content-aware algorithms and optimized chunk sizes"""
     
+    # Content-specific chunk sizes (optimized for each type)
+    chunk_sizes = MappingProxyType({
+        'mcq': 800,        # Single MCQ with options
+        'creative': 1500,   # Creative questions with context
+        'table': 1200,      # Table rows with structure
+        'general': 1000,    # General text content
+        'raw': 1000        # Raw OCR content
+    })
+    
+    # Content-specific overlap
+    overlaps = MappingProxyType({
+        'mcq': 50,         # Minimal overlap for discrete questions
+        'creative': 150,    # More overlap for context preservation
+        'table': 100,       # Medium overlap for table continuity
+        'general': 100,     # Standard overlap
+        'raw': 100         # Standard overlap
+    })
+    
     def __init__(self):
         self.settings = get_settings()
-        
-        # Content-specific chunk sizes (optimized for each type)
-        self.chunk_sizes = {
-            'mcq': 800,        # Single MCQ with options
-            'creative': 1500,   # Creative questions with context
-            'table': 1200,      # Table rows with structure
-            'general': 1000,    # General text content
-            'raw': 1000        # Raw OCR content
-        }
-        
-        # Content-specific overlap
-        self.overlaps = {
-            'mcq': 50,         # Minimal overlap for discrete questions
-            'creative': 150,    # More overlap for context preservation
-            'table': 100,       # Medium overlap for table continuity
-            'general': 100,     # Standard overlap
-            'raw': 100         # Standard overlap
-        }
     
-    def chunk_separated_content_only(self, base_path: str) -> List[DocumentChunk]:
-        """
-        Process only the separated content files with smart chunking
-        
-        Args:
-            base_path: Base path to processed documents
-            
-        Returns:
-            List of optimally chunked documents
-        """
-        all_chunks = []
-        
+    def _content_jobs(self, base_path: str) -> List[Tuple[str, str]]:
+        """List the (file_path, content_type) pairs for the separated content files that exist"""
         # Process only separated content files
         content_files = {
             'mcq_content.txt': 'mcq',
@@ -63,41 +225,90 @@ class SmartContentChunker:
         
         separated_path = os.path.join(base_path, 'separated_content')
         
+        jobs = []
         for filename, content_type in content_files.items():
             file_path = os.path.join(separated_path, filename)
-            
             if os.path.exists(file_path):
-                chunks = self._chunk_by_content_type(file_path, content_type)
-                all_chunks.extend(chunks)
-                print(f"✅ {filename}: {len(chunks)} chunks (avg size: {self._avg_chunk_size(chunks):.0f} chars)")
+                jobs.append((file_path, content_type))
+        return jobs
+    
+    def _iter_chunk_batches(self, base_path: str) -> Iterator[Tuple[str, ChunkBatch]]:
+        """
+        Chunk the separated content files, yielding (file_path, batch) in file order
         
-        print(f"🎯 Total chunks created: {len(all_chunks)}")
-        return all_chunks
+        The files are independent and chunking is CPU-bound, so they are fanned
+        out across worker processes; each file is yielded as soon as it and the
+        files before it are done.
+        """
+        jobs = self._content_jobs(base_path)
+        
+        if len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=min(4, len(jobs))) as executor:
+                for (file_path, _), batch in zip(jobs, executor.map(_chunk_one, jobs)):
+                    yield file_path, batch
+        else:
+            for job in jobs:
+                yield job[0], _chunk_one(job)
+    
+    def iter_chunks(self, base_path: str) -> Iterator[DocumentChunk]:
+        """
+        Chunk the separated content files, yielding chunks file by file
+        
+        Only finished files are held in memory, so a caller can embed and store
+        the first file's chunks in mini-batches while later files are still
+        being chunked in worker processes.
+        
+        Args:
+            base_path: Base path to processed documents
+            
+        Yields:
+            Document chunks in file order
+        """
+        for file_path, batch in self._iter_chunk_batches(base_path):
+            print(f"✅ {os.path.basename(file_path)}: {len(batch)} chunks (avg size: {self._avg_chunk_size(batch):.0f} chars)")
+            yield from batch
     
-    def _chunk_by_content_type(self, file_path: str, content_type: str) -> List[DocumentChunk]:
-        """Smart chunking based on content type"""
+    def chunk_separated_content_only(self, base_path: str) -> ChunkBatch:
+        """
+        Process only the separated content files with smart chunking
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        Args:
+            base_path: Base path to processed documents
+            
+        Returns:
+            Batch of optimally chunked documents
+        """
+        all_chunks = ChunkBatch()
         
+        for file_path, chunks in self._iter_chunk_batches(base_path):
+            all_chunks.extend(chunks)
+            print(f"✅ {os.path.basename(file_path)}: {len(chunks)} chunks (avg size: {self._avg_chunk_size(chunks):.0f} chars)")
+        
+        print(f"🎯 Total chunks created: {len(all_chunks)}")
+        return all_chunks
+    
+    def _chunk_by_content_type(self, file_path: str, content_type: str) -> Iterator[DocumentChunk]:
+        """Smart chunking based on content type, streaming the file section by section"""
         if content_type == 'mcq':
-            return self._chunk_mcq_smart(content, file_path)
+            return self._chunk_mcq_smart(_iter_sections(file_path, _PARA_RE), file_path)
         elif content_type == 'creative':
-            return self._chunk_creative_smart(content, file_path)
+            return self._chunk_creative_smart(_iter_sections(file_path, _CREATIVE_SEP_RE), file_path)
         elif content_type == 'table':
-            return self._chunk_table_smart(content, file_path)
+            return self._chunk_table_smart(_iter_sections(file_path, _PARA_RE), file_path)
         else:
-            return self._chunk_general_smart(content, file_path, content_type)
+            return self._chunk_general_smart(_iter_sections(file_path, _PARA_RE), file_path, content_type)
     
-    def _chunk_mcq_smart(self, content: str, file_path: str) -> List[DocumentChunk]:
+    def _chunk_mcq_smart(self, sections: Iterable[str], file_path: str) -> Iterator[DocumentChunk]:
         """
         Smart MCQ chunking - each question as a separate chunk
         Separated by newlines as you mentioned
         """
-        chunks = []
+        # Shared metadata: one interned path/type per file, copied per chunk
+        file_path = sys.intern(file_path)
+        base_meta = {'content_type': 'mcq', 'source_file': file_path}
         
-        # Split by double newlines or question patterns
-        questions = re.split(r'\n\n+|(?=\d+[\।.])', content)
+        # Split each paragraph further by question patterns
+        questions = (q for section in sections for q in _MCQ_SPLIT_RE.split(section))
         
         for i, question_block in enumerate(questions):
             question_block = question_block.strip()
@@ -107,32 +318,27 @@ class SmartContentChunker:
             # Clean the question
             clean_question = self._clean_text(question_block)
             
-            chunk = DocumentChunk(
+            yield DocumentChunk(
                 text=clean_question,
-                chunk_id=f"mcq_{i}_{hash(clean_question) % 10000}",
+                chunk_id=f"mcq_{i}_{_short_digest(clean_question).hexdigest()}",
                 metadata={
-                    'content_type': 'mcq',
-                    'source_file': file_path,
+                    **base_meta,
                     'chunk_index': i,
                     'question_number': self._extract_question_number(clean_question)
                 },
                 content_type="mcq"
             )
-            chunks.append(chunk)
-        
-        return chunks
     
-    def _chunk_creative_smart(self, content: str, file_path: str) -> List[DocumentChunk]:
+    def _chunk_creative_smart(self, sections: Iterable[str], file_path: str) -> Iterator[DocumentChunk]:
         """
         Smart creative question chunking - separated by --- as you mentioned
         Each question with its context and sub-questions
         """
-        chunks = []
-        
-        # Split by --- separators
-        question_sections = content.split('---')
+        # Shared metadata: one interned path/type per file, copied per chunk
+        file_path = sys.intern(file_path)
+        base_meta = {'content_type': 'creative', 'source_file': file_path}
         
-        for i, section in enumerate(question_sections):
+        for i, section in enumerate(sections):
             section = section.strip()
             if not section or len(section) < 50:
                 continue
@@ -140,209 +346,218 @@ class SmartContentChunker:
             # Each creative question section is already well-sized
             # No need to split further as they contain context + questions
             
-            chunk = DocumentChunk(
+            yield DocumentChunk(
                 text=section,
-                chunk_id=f"creative_{i}_{hash(section) % 10000}",
+                chunk_id=f"creative_{i}_{_short_digest(section).hexdigest()}",
                 metadata={
-                    'content_type': 'creative',
-                    'source_file': file_path,
+                    **base_meta,
                     'chunk_index': i,
                     'question_set': f"Question {i + 1}"
                 },
                 content_type="creative"
             )
-            chunks.append(chunk)
-        
-        return chunks
     
-    def _chunk_table_smart(self, content: str, file_path: str) -> List[DocumentChunk]:
+    def _chunk_table_smart(self, sections: Iterable[str], file_path: str) -> Iterator[DocumentChunk]:
         """
         Smart table chunking - separated by newlines as you mentioned
         Preserve table structure
         """
-        chunks = []
-        
-        # Split by double newlines to get table sections
-        table_sections = re.split(r'\n\n+', content)
+        # Shared metadata: one interned path/type per file, copied per chunk
+        file_path = sys.intern(file_path)
+        base_meta = {'content_type': 'table', 'source_file': file_path}
         
         chunk_size = self.chunk_sizes['table']
         overlap = self.overlaps['table']
         
+        # Table sections are the non-empty paragraphs
+        table_sections = (section for section in map(str.strip, sections) if section)
+        
         for section_idx, section in enumerate(table_sections):
-            section = section.strip()
-            if not section:
-                continue
-            
             if len(section) <= chunk_size:
                 # Section fits in one chunk
-                chunk = DocumentChunk(
+                yield DocumentChunk(
                     text=section,
-                    chunk_id=f"table_{section_idx}_{hash(section) % 10000}",
+                    chunk_id=f"table_{section_idx}_{_short_digest(section).hexdigest()}",
                     metadata={
-                        'content_type': 'table',
-                        'source_file': file_path,
+                        **base_meta,
                         'chunk_index': section_idx,
                         'table_section': section_idx + 1
                     },
                     content_type="table"
                 )
-                chunks.append(chunk)
             else:
                 # Split large table section by rows
                 rows = section.split('\n')
-                current_chunk = ""
+                buf: List[str] = []
+                buf_len = 0
+                hasher = _short_digest()
                 sub_chunk_idx = 0
                 
                 for row in rows:
-                    if len(current_chunk) + len(row) + 1 <= chunk_size:
-                        current_chunk += row + "\n"
-                    else:
-                        if current_chunk.strip():
-                            chunk = DocumentChunk(
-                                text=current_chunk.strip(),
-                                chunk_id=f"table_{section_idx}_{sub_chunk_idx}_{hash(current_chunk) % 10000}",
+                    piece = row + "\n"
+                    if buf and buf_len + len(piece) > chunk_size:
+                        chunk_text = ''.join(buf).strip()
+                        if chunk_text:
+                            yield DocumentChunk(
+                                text=chunk_text,
+                                chunk_id=f"table_{section_idx}_{sub_chunk_idx}_{hasher.hexdigest()}",
                                 metadata={
-                                    'content_type': 'table',
-                                    'source_file': file_path,
+                                    **base_meta,
                                     'chunk_index': f"{section_idx}.{sub_chunk_idx}",
                                     'table_section': section_idx + 1
                                 },
                                 content_type="table"
                             )
-                            chunks.append(chunk)
                             sub_chunk_idx += 1
                         
-                        # Start new chunk with overlap
-                        overlap_rows = current_chunk.split('\n')[-2:] if overlap > 0 else []
-                        current_chunk = '\n'.join(overlap_rows) + '\n' + row + '\n'
+                        # Start new chunk with the trailing rows as overlap, unless
+                        # they would push it past chunk_size together with this row
+                        start, buf_len = _overlap_window(buf, overlap)
+                        if buf_len + len(piece) > chunk_size:
+                            start, buf_len = len(buf), 0
+                        buf = buf[start:]
+                        hasher = _short_digest(*buf)
+                    
+                    buf.append(piece)
+                    buf_len += len(piece)
+                    hasher.update(piece.encode('utf-8'))
                 
                 # Add final chunk
-                if current_chunk.strip():
-                    chunk = DocumentChunk(
-                        text=current_chunk.strip(),
-                        chunk_id=f"table_{section_idx}_{sub_chunk_idx}_{hash(current_chunk) % 10000}",
+                chunk_text = ''.join(buf).strip()
+                if chunk_text:
+                    yield DocumentChunk(
+                        text=chunk_text,
+                        chunk_id=f"table_{section_idx}_{sub_chunk_idx}_{hasher.hexdigest()}",
                         metadata={
-                            'content_type': 'table',
-                            'source_file': file_path,
+                            **base_meta,
                             'chunk_index': f"{section_idx}.{sub_chunk_idx}",
                             'table_section': section_idx + 1
                         },
                         content_type="table"
                     )
-                    chunks.append(chunk)
-        
-        return chunks
     
-    def _chunk_general_smart(self, content: str, file_path: str, content_type: str) -> List[DocumentChunk]:
+    def _chunk_general_smart(self, sections: Iterable[str], file_path: str, content_type: str) -> Iterator[DocumentChunk]:
         """Smart general content chunking with sentence awareness"""
-        chunks = []
+        # Shared metadata: one interned path/type per file, copied per chunk
+        file_path = sys.intern(file_path)
+        base_meta = {'content_type': sys.intern(content_type), 'source_file': file_path}
         
         chunk_size = self.chunk_sizes[content_type]
         overlap = self.overlaps[content_type]
         
-        # Split by sentences for better chunking
-        sentences = self._split_sentences_smart(content)
+        # Split each paragraph by sentences for better chunking
+        sentences = (sentence for section in sections for sentence in self._split_sentences_smart(section))
         
-        current_chunk = ""
+        # Accumulate sentences in a list and join once per chunk
+        buf: List[str] = []
+        buf_len = 0
+        hasher = _short_digest()
         chunk_idx = 0
         
         for sentence in sentences:
-            if len(current_chunk) + len(sentence) <= chunk_size:
-                current_chunk += sentence + " "
-            else:
-                if current_chunk.strip():
-                    chunk = DocumentChunk(
-                        text=current_chunk.strip(),
-                        chunk_id=f"{content_type}_{chunk_idx}_{hash(current_chunk) % 10000}",
-                        metadata={
-                            'content_type': content_type,
-                            'source_file': file_path,
-                            'chunk_index': chunk_idx
-                        },
-                        content_type=content_type
-                    )
-                    chunks.append(chunk)
-                    chunk_idx += 1
+            if buf and buf_len + len(sentence) > chunk_size:
+                joined = ''.join(buf)
+                chunk_text = joined.strip()
+                yield DocumentChunk(
+                    text=chunk_text,
+                    chunk_id=f"{content_type}_{chunk_idx}_{hasher.hexdigest()}",
+                    metadata={
+                        **base_meta,
+                        'chunk_index': chunk_idx
+                    },
+                    content_type=content_type
+                )
+                chunk_idx += 1
                 
-                # Add overlap
-                overlap_text = current_chunk[-overlap:] if len(current_chunk) > overlap else ""
-                current_chunk = overlap_text + sentence + " "
+                # Add overlap: at most the last `overlap` characters
+                tail = joined[-overlap:] if len(joined) > overlap else ""
+                buf = [tail] if tail else []
+                buf_len = len(tail)
+                hasher = _short_digest(tail)
+            
+            piece = sentence + " "
+            buf.append(piece)
+            buf_len += len(piece)
+            hasher.update(piece.encode('utf-8'))
         
         # Add final chunk
-        if current_chunk.strip():
-            chunk = DocumentChunk(
-                text=current_chunk.strip(),
-                chunk_id=f"{content_type}_{chunk_idx}_{hash(current_chunk) % 10000}",
+        chunk_text = ''.join(buf).strip()
+        if chunk_text:
+            yield DocumentChunk(
+                text=chunk_text,
+                chunk_id=f"{content_type}_{chunk_idx}_{hasher.hexdigest()}",
                 metadata={
-                    'content_type': content_type,
-                    'source_file': file_path,
+                    **base_meta,
                     'chunk_index': chunk_idx
                 },
                 content_type=content_type
             )
-            chunks.append(chunk)
-        
-        return chunks
     
     def _extract_question_number(self, text: str) -> str:
         """Extract question number from MCQ text"""
-        match = re.match(r'(\d+)', text.strip())
+        match = _QNUM_RE.match(text.strip())
         return match.group(1) if match else "unknown"
     
     def _clean_text(self, text: str) -> str:
-        """Clean and normalize text"""
-        # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Remove markdown-style markers
-        text = re.sub(r'\*\*.*?\*\*', '', text)
-        text = re.sub(r'📖|🎯|✓', '', text)
-        return text.strip()
+        """Clean and normalize text: strip markers, then a single regex pass"""
+        return _CLEAN_RE.sub(_clean_sub, text.translate(_STRIP_TBL)).strip()
     
-    def _split_sentences_smart(self, text: str) -> List[str]:
-        """Smart sentence splitting for Bengali text"""
+    def _split_sentences_smart(self, text: str) -> Iterator[str]:
+        """Smart sentence splitting for Bengali text, yielding sentences lazily"""
         # Bengali sentence endings and paragraph breaks
-        sentence_pattern = r'[।৺]|\n\n+'
-        sentences = re.split(sentence_pattern, text)
-        return [s.strip() for s in sentences if s.strip()]
+        for start, end in _iter_sentence_spans(text):
+            sentence = text[start:end].strip()
+            if sentence:
+                yield sentence
     
-    def _avg_chunk_size(self, chunks: List[DocumentChunk]) -> float:
+    def _avg_chunk_size(self, chunks: ChunkBatch) -> float:
         """Calculate average chunk size"""
         if not chunks:
             return 0
-        return sum(len(chunk.text) for chunk in chunks) / len(chunks)
+        return sum(map(len, chunks.texts)) / len(chunks)
     
-    def get_chunking_stats(self, chunks: List[DocumentChunk]) -> Dict[str, Any]:
+    def get_chunking_stats(self, chunks: Union[ChunkBatch, List[DocumentChunk]]) -> Dict[str, Any]:
         """Get detailed chunking statistics"""
+        if not isinstance(chunks, ChunkBatch):
+            chunks = ChunkBatch.from_chunks(chunks)
+        
         stats = {
             'total_chunks': len(chunks),
             'by_content_type': {},
-            'avg_chunk_size': self._avg_chunk_size(chunks),
+            'avg_chunk_size': 0,
             'chunk_size_ranges': {}
         }
         
-        # Group by content type
-        for chunk in chunks:
-            content_type = chunk.content_type
-            if content_type not in stats['by_content_type']:
-                stats['by_content_type'][content_type] = {
-                    'count': 0,
-                    'avg_size': 0,
-                    'min_size': float('inf'),
-                    'max_size': 0
-                }
-            
-            stats['by_content_type'][content_type]['count'] += 1
-            chunk_len = len(chunk.text)
-            stats['by_content_type'][content_type]['min_size'] = min(
-                stats['by_content_type'][content_type]['min_size'], chunk_len
-            )
-            stats['by_content_type'][content_type]['max_size'] = max(
-                stats['by_content_type'][content_type]['max_size'], chunk_len
-            )
+        if not len(chunks):
+            return stats
+        
+        # Column sweeps, vectorized reductions afterwards
+        lens = np.fromiter(map(len, chunks.texts), dtype=np.int64, count=len(chunks))
+        codes = np.frombuffer(chunks.content_types, dtype=np.uint8)
+        
+        counts = np.bincount(codes, minlength=len(CONTENT_TYPES))
+        sums = np.bincount(codes, weights=lens, minlength=len(CONTENT_TYPES))
+        present = np.flatnonzero(counts)
         
-        # Calculate averages
-        for content_type, data in stats['by_content_type'].items():
-            type_chunks = [c for c in chunks if c.content_type == content_type]
-            data['avg_size'] = sum(len(c.text) for c in type_chunks) / len(type_chunks)
+        # Sort lengths by code so each type is a contiguous segment for reduceat
+        sorted_lens = lens[np.argsort(codes, kind='stable')]
+        starts = np.concatenate(([0], np.cumsum(counts[present])[:-1]))
+        mins = np.minimum.reduceat(sorted_lens, starts)
+        maxs = np.maximum.reduceat(sorted_lens, starts)
+        
+        stats['avg_chunk_size'] = float(lens.mean())
+        for j, code in enumerate(present.tolist()):
+            stats['by_content_type'][CONTENT_TYPES[code]] = {
+                'count': int(counts[code]),
+                'avg_size': float(sums[code] / counts[code]),
+                'min_size': int(mins[j]),
+                'max_size': int(maxs[j])
+            }
         
         return stats
+
+
+def _chunk_one(job: Tuple[str, str]) -> ChunkBatch:
+    """Chunk a single (file_path, content_type) job; module-level so worker processes can pickle it"""
+    file_path, content_type = job
+    return ChunkBatch.from_chunks(SmartContentChunker()._chunk_by_content_type(file_path, content_type))
@@ -2,11 +2,16 @@
 Vector database implementation using ChromaDB
 """
 import os
-from typing import List, Dict, Any, Optional
+import sys
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 import chromadb
 from chromadb.config import Settings
 from src.config.settings import get_settings
 from src.utils.logger import setup_logger
+from src.utils.hashing import hash_bytes
 
 
 class VectorStore:
@@ -16,6 +21,10 @@ class VectorStore:
         self.settings = get_settings()
         self.logger = setup_logger(__name__)
         
+        # Settings read by the hot paths, resolved once
+        self._cname = self.settings.collection_name
+        self._dim = self.settings.embedding_dimension
+        
         # Create ChromaDB directory if it doesn't exist
         os.makedirs(self.settings.chroma_db_path, exist_ok=True)
         
@@ -25,47 +34,83 @@ class VectorStore:
             settings=Settings(anonymized_telemetry=False)
         )
         
+        # Embeddings are L2-normalized, so inner product equals cosine similarity
+        self.collection_metadata = {
+            "description": "HSC Bangla document embeddings",
+            "hnsw:space": "ip",
+            "hnsw:M": self.settings.hnsw_m,
+            "hnsw:construction_ef": self.settings.hnsw_construction_ef,
+            "hnsw:search_ef": self.settings.hnsw_search_ef
+        }
+        
+        # Prebuilt metadata filters, one per known content type
+        self._where_by_type = {
+            ct: {"content_type": ct} for ct in ('mcq', 'creative', 'table', 'general', 'raw')
+        }
+        self._where_by_type[None] = None
+        
+        # Rows per collection.add call; bounds the size of each SQLite transaction
+        self.batch_size = 1000
+        
+        # LRU cache of search results, stored as tuples and copied out on every hit so
+        # callers can't mutate shared state; _cache_gen is bumped whenever the collection changes
+        self.search_cache: "OrderedDict[Tuple[str, int, Optional[str], int], Tuple[tuple, ...]]" = OrderedDict()
+        self.search_cache_size = 256
+        self._cache_gen = 0
+        self._cache_lock = threading.Lock()
+        
         # Get or create collection
         self.collection = self.client.get_or_create_collection(
-            name=self.settings.collection_name,
-            metadata={"description": "HSC Bangla document embeddings"}
+            name=self._cname,
+            metadata=self.collection_metadata
         )
         
-        self.logger.info(f"Vector store initialized with collection: {self.settings.collection_name}")
+        self.logger.info(f"Vector store initialized with collection: {self._cname}")
     
-    def add_documents(self, texts: List[str], embeddings: List[List[float]], metadatas: List[Dict[str, Any]] = None) -> None:
+    def add_documents(self, texts: List[str], embeddings: np.ndarray, metadatas: List[Dict[str, Any]] = None,
+                      ids: Optional[List[str]] = None) -> None:
         """
         Add document texts and their embeddings to the vector store
         
         Args:
             texts: List of text strings
-            embeddings: List of embedding vectors
+            embeddings: float32 array of shape (len(texts), embedding_dimension)
             metadatas: Optional list of metadata dictionaries
+            ids: Optional unique document IDs (required when adding in several calls)
         """
         if len(texts) != len(embeddings):
             raise ValueError("Number of texts must match number of embeddings")
         
         # Prepare data for ChromaDB
-        ids = [f"doc_{i}" for i in range(len(texts))]
+        if ids is None:
+            ids = [f"doc_{i}" for i in range(len(texts))]
         if metadatas is None:
             metadatas = [{"source": "processed_documents"} for _ in texts]
         
+        # One contiguous float32 matrix; row slices below are zero-copy views
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        batch_size = self.batch_size
+        
         try:
-            self.collection.add(
-                ids=ids,
-                documents=texts,
-                embeddings=embeddings,
-                metadatas=metadatas
-            )
+            for start in range(0, len(texts), batch_size):
+                end = start + batch_size
+                self.collection.add(
+                    ids=ids[start:end],
+                    documents=texts[start:end],
+                    embeddings=embeddings[start:end],
+                    metadatas=metadatas[start:end]
+                )
             
             self.logger.info(f"Added {len(texts)} documents to vector store")
             
         except Exception as e:
             self.logger.error(f"Error adding documents to vector store: {e}")
             raise
+        finally:
+            self._invalidate_cache()
     
-    def search(self, query_embedding: List[float], n_results: int = 5, 
-               content_type: Optional[str] = None) -> Dict[str, Any]:
+    def search(self, query_embedding: np.ndarray, n_results: int = 5, 
+               content_type: Optional[str] = None, normalized: bool = False) -> Dict[str, Any]:
         """
         Search for similar documents using embedding similarity
         
@@ -73,30 +118,61 @@ class VectorStore:
             query_embedding: Query embedding vector
             n_results: Number of results to return
             content_type: Filter by content type (mcq, text, etc.)
+            normalized: Whether query_embedding is already L2-normalized; the
+                collection uses inner-product distance, so it is normalized here otherwise
             
         Returns:
             Dictionary containing search results
         """
+        query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        if not normalized:
+            norm = np.linalg.norm(query_embedding)
+            if norm > 0:
+                query_embedding = query_embedding / norm
+        cache_key = (hash_bytes(query_embedding.tobytes()), n_results, content_type, self._cache_gen)
+        
+        with self._cache_lock:
+            cached = self.search_cache.get(cache_key)
+            if cached is not None:
+                self.search_cache.move_to_end(cache_key)
+        if cached is not None:
+            return self._result_from_cache(cached)
+        
         try:
-            # Prepare query filters
-            where_clause = {}
-            if content_type:
-                where_clause["content_type"] = content_type
+            # Look up the prebuilt filter; unknown types still get a filter
+            where = self._where_by_type.get(content_type)
+            if where is None and content_type:
+                where = {"content_type": content_type}
             
             # Perform similarity search
             results = self.collection.query(
                 query_embeddings=[query_embedding],
                 n_results=n_results,
-                where=where_clause if where_clause else None,
+                where=where,
                 include=['documents', 'metadatas', 'distances']
             )
             
-            return {
-                'documents': results['documents'][0],
-                'metadatas': results['metadatas'][0],
-                'distances': results['distances'][0],
-                'ids': results['ids'][0]
-            }
+            # Intern content types decoded from Chroma so the retriever's
+            # comparisons against its constants hit the identity fast path
+            metadatas = results['metadatas'][0]
+            for metadata in metadatas:
+                content_type = metadata.get('content_type') if metadata else None
+                if content_type is not None:
+                    metadata['content_type'] = sys.intern(content_type)
+            
+            entry = (
+                tuple(results['documents'][0]),
+                tuple(metadatas),
+                tuple(results['distances'][0]),
+                tuple(results['ids'][0])
+            )
+            
+            with self._cache_lock:
+                self.search_cache[cache_key] = entry
+                if len(self.search_cache) > self.search_cache_size:
+                    self.search_cache.popitem(last=False)
+            
+            return self._result_from_cache(entry)
             
         except Exception as e:
             self.logger.error(f"Error searching vector store: {e}")
@@ -107,14 +183,25 @@ class VectorStore:
                 'ids': []
             }
     
+    @staticmethod
+    def _result_from_cache(entry: Tuple[tuple, ...]) -> Dict[str, Any]:
+        """Build a search result with fresh lists and metadata dicts from a cache entry"""
+        documents, metadatas, distances, ids = entry
+        return {
+            'documents': list(documents),
+            'metadatas': [dict(metadata) if metadata else metadata for metadata in metadatas],
+            'distances': list(distances),
+            'ids': list(ids)
+        }
+    
     def get_collection_info(self) -> Dict[str, Any]:
         """Get information about the collection"""
         try:
             count = self.collection.count()
             return {
-                'collection_name': self.settings.collection_name,
+                'collection_name': self._cname,
                 'document_count': count,
-                'embedding_dimension': self.settings.embedding_dimension
+                'embedding_dimension': self._dim
             }
         except Exception as e:
             self.logger.error(f"Error getting collection info: {e}")
@@ -124,12 +211,20 @@ class VectorStore:
         """Clear all documents from the collection"""
         try:
             # Delete and recreate collection
-            self.client.delete_collection(self.settings.collection_name)
+            self.client.delete_collection(self._cname)
             self.collection = self.client.get_or_create_collection(
-                name=self.settings.collection_name,
-                metadata={"description": "HSC Bangla document embeddings"}
+                name=self._cname,
+                metadata=self.collection_metadata
             )
             self.logger.info("Collection cleared successfully")
         except Exception as e:
             self.logger.error(f"Error clearing collection: {e}")
             raise
+        finally:
+            self._invalidate_cache()
+    
+    def _invalidate_cache(self) -> None:
+        """Drop cached search results after the collection changes"""
+        with self._cache_lock:
+            self._cache_gen += 1
+            self.search_cache.clear()
@@ -3,16 +3,64 @@ Memory Manager for Multilingual RAG System
 Handles short-term (chat history) and long-term (document corpus) memory
 """
 import json
+import os
+import queue
+import shutil
+import sys
+import threading
 import time
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, asdict
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from itertools import islice
+from typing import Deque, Dict, List, Any, Optional, Iterable, Iterator
+from dataclasses import dataclass
 from pathlib import Path
 
+import xxhash
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import ormsgpack
+except ImportError:  # pragma: no cover - optional speedup
+    ormsgpack = None
+
 from src.config.settings import get_settings
 from src.utils.logger import setup_logger
 
 
-@dataclass
+# Shared language codes so every message points at the same string object
+_LANG_BN = sys.intern('bn')
+_LANG_EN = sys.intern('en')
+
+
+def _intern_language(language: str) -> str:
+    """Return the canonical interned object for a language code"""
+    if language == 'bn':
+        return _LANG_BN
+    if language == 'en':
+        return _LANG_EN
+    return sys.intern(language)
+
+
+def _dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
+
+def _loads(data: bytes) -> Any:
+    """Parse UTF-8 JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+@dataclass(slots=True)
 class ChatMessage:
     """Represents a single chat message"""
     timestamp: float
@@ -24,16 +72,40 @@ class ChatMessage:
     sources_used: List[str]
 
 
-@dataclass
+@dataclass(slots=True)
 class ChatSession:
     """Represents a chat session with multiple messages"""
     session_id: str
     created_at: float
     last_activity: float
-    messages: List[ChatMessage]
+    messages: Deque[ChatMessage]  # bounded to the newest max_session_memory messages
     message_count: int
 
 
+def _message_to_dict(message: ChatMessage) -> Dict[str, Any]:
+    """Serializable dict for a message; explicit literal instead of asdict() reflection"""
+    return {
+        'timestamp': message.timestamp,
+        'query': message.query,
+        'response': message.response,
+        'language': message.language,
+        'confidence': message.confidence,
+        'session_id': message.session_id,
+        'sources_used': list(message.sources_used)
+    }
+
+
+def _session_to_dict(session: ChatSession) -> Dict[str, Any]:
+    """Serializable dict for a session and its messages"""
+    return {
+        'session_id': session.session_id,
+        'created_at': session.created_at,
+        'last_activity': session.last_activity,
+        'messages': [_message_to_dict(message) for message in session.messages],
+        'message_count': session.message_count
+    }
+
+
 class MemoryManager:
     """Manages short-term and long-term memory for the RAG system"""
     
@@ -46,19 +118,43 @@ class MemoryManager:
         self.memory_dir.mkdir(exist_ok=True)
         
         self.sessions_file = self.memory_dir / "chat_sessions.json"
+        self.sessions_pack_file = self.memory_dir / "chat_sessions.mpk"  # used when ormsgpack is installed
+        self.journal_file = self.memory_dir / "chat_journal.ndjson"
+        self.rotated_journal_file = self.memory_dir / "chat_journal.ndjson.1"  # awaiting its snapshot
         self.long_term_stats_file = self.memory_dir / "long_term_stats.json"
         
-        # In-memory storage for active sessions
-        self.active_sessions: Dict[str, ChatSession] = {}
+        # In-memory storage for active sessions, least recently used first
+        self.active_sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
         
         # Configuration
         self.max_session_memory = 50  # Maximum messages per session
         self.session_timeout = 3600  # 1 hour in seconds
         self.max_active_sessions = 100
+        self.journal_flush_every = 5  # Flush the journal buffer every N messages
+        self.journal_max_bytes = 1024 * 1024  # Compact into the snapshot past 1MB
+        
+        # Serialized session dicts by session ID, valid while message_count is unchanged
+        self._session_dict_cache: Dict[str, tuple] = {}
+        
+        # Running aggregates over the messages held in memory, for get_global_stats
+        self._language_counts: Counter = Counter()
+        self._confidence_sum = 0.0
+        self._message_total = 0
         
-        # Load existing sessions
+        # Load existing sessions (snapshot, then journal replay)
         self._load_sessions()
         
+        # New messages are appended to the journal instead of rewriting the snapshot
+        self._journal_fp = open(self.journal_file, 'ab', buffering=64 * 1024)
+        self._unflushed = 0
+        
+        # Snapshots are serialized on the caller's thread and written by a background writer
+        self._save_queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=16)
+        self._saver_idle = threading.Event()
+        self._saver_idle.set()
+        self._saver = threading.Thread(target=self._save_worker, name="memory-saver", daemon=True)
+        self._saver.start()
+        
         self.logger.info("Memory Manager initialized")
     
     def _generate_session_id(self) -> str:
@@ -66,56 +162,239 @@ class MemoryManager:
         return f"session_{int(time.time())}_{hash(str(time.time())) % 10000}"
     
     def _load_sessions(self):
-        """Load chat sessions from disk"""
-        if self.sessions_file.exists():
+        """Load chat sessions from the snapshot and replay the journal on top"""
+        snapshot_time = 0.0
+        data = self._read_latest_snapshot()
+        if data is not None:
             try:
-                with open(self.sessions_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                snapshot_time = data.get('last_updated', 0.0)
                     
                 for session_data in data.get('sessions', []):
                     session = ChatSession(**session_data)
                     # Convert message dicts back to ChatMessage objects
-                    session.messages = [ChatMessage(**msg) for msg in session.messages]
+                    for msg in session.messages:
+                        msg['language'] = _intern_language(msg['language'])
+                    session.messages = deque(
+                        (ChatMessage(**msg) for msg in session.messages),
+                        maxlen=self.max_session_memory
+                    )
                     self.active_sessions[session.session_id] = session
+                    self._track_messages(session.messages)
                     
                 self.logger.info(f"Loaded {len(self.active_sessions)} chat sessions")
             except Exception as e:
                 self.logger.error(f"Error loading sessions: {e}")
+        
+        self._replay_journal(snapshot_time)
     
-    def _save_sessions(self):
-        """Save chat sessions to disk"""
+    def _read_latest_snapshot(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the newest snapshot this process can read (MessagePack or JSON)
+        
+        Snapshots are compared by their 'last_updated' stamp rather than file mtime,
+        since a git checkout can touch a stale chat_sessions.json.
+        """
+        candidates = [self.sessions_file]
+        if ormsgpack is not None:
+            candidates.append(self.sessions_pack_file)
+        
+        latest = None
+        for path in candidates:
+            if not path.exists():
+                continue
+            try:
+                blob = path.read_bytes()
+                data = ormsgpack.unpackb(blob) if path.suffix == '.mpk' else _loads(blob)
+            except Exception as e:
+                self.logger.error(f"Error reading snapshot {path.name}: {e}")
+                continue
+            if latest is None or data.get('last_updated', 0.0) > latest.get('last_updated', 0.0):
+                latest = data
+        return latest
+    
+    def _replay_journal(self, snapshot_time: float):
+        """
+        Apply journal records written after the last snapshot
+        
+        Args:
+            snapshot_time: 'last_updated' of the snapshot; older records are already in it
+        """
+        replayed = 0
         try:
-            # Convert to serializable format
+            for path in (self.rotated_journal_file, self.journal_file):
+                if path.exists():
+                    replayed += self._replay_journal_file(path, snapshot_time)
+            
+            if replayed:
+                self.logger.info(f"Replayed {replayed} journal records")
+        except Exception as e:
+            self.logger.error(f"Error replaying journal: {e}")
+    
+    def _replay_journal_file(self, path: Path, snapshot_time: float) -> int:
+        """Apply the records of one journal file; returns how many were applied"""
+        replayed = 0
+        with open(path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = _loads(line)
+                except ValueError:
+                    # Torn final write from an unclean shutdown
+                    self.logger.warning("Skipping unreadable journal record")
+                    continue
+                
+                if record.get('ts', 0.0) <= snapshot_time:
+                    continue
+                
+                if record['op'] == 'msg':
+                    self._apply_message(record['sid'], ChatMessage(**record['msg']))
+                elif record['op'] == 'clear':
+                    self._drop_session(record['sid'])
+                replayed += 1
+        return replayed
+    
+    def _append_journal(self, record: Dict[str, Any], flush: bool = False):
+        """Append one NDJSON record to the journal, flushing every few messages"""
+        try:
+            self._journal_fp.write(_dumps(record) + b'\n')
+            self._unflushed += 1
+            
+            if flush or self._unflushed >= self.journal_flush_every:
+                self._journal_fp.flush()
+                self._unflushed = 0
+            
+            if self._journal_fp.tell() > self.journal_max_bytes:
+                self._compact()
+        except Exception as e:
+            self.logger.error(f"Error writing journal: {e}")
+    
+    def _compact(self, background: bool = True):
+        """
+        Fold the journal into a fresh snapshot
+        
+        The journal is rotated aside and a new one started, so appends never
+        wait on the snapshot. The rotated journal is deleted only after the
+        snapshot that covers it has been written; until then a restart simply
+        replays it.
+        
+        Args:
+            background: Hand the write to the saver thread instead of writing here
+        """
+        if not self._saver_idle.is_set():
+            if background:
+                return  # Previous snapshot still in flight
+            self._save_queue.join()
+        
+        self._rotate_journal()
+        
+        job = self._serialize_sessions()
+        if job is None:
+            return
+        
+        if background:
+            self._saver_idle.clear()
+            self._save_queue.put(job)
+        else:
+            self._write_snapshot(*job)
+    
+    def _rotate_journal(self):
+        """Move the live journal aside and start a new one"""
+        self._journal_fp.flush()
+        self._journal_fp.close()
+        
+        if self.rotated_journal_file.exists():
+            # An earlier snapshot never landed; keep its records ahead of the new ones
+            with open(self.rotated_journal_file, 'ab') as dst, open(self.journal_file, 'rb') as src:
+                shutil.copyfileobj(src, dst)
+            self.journal_file.unlink()
+        else:
+            os.replace(self.journal_file, self.rotated_journal_file)
+        
+        self._journal_fp = open(self.journal_file, 'ab', buffering=64 * 1024)
+        self._unflushed = 0
+    
+    def _save_worker(self):
+        """Background writer: persist queued snapshots in order"""
+        while True:
+            job = self._save_queue.get()
+            try:
+                if job is None:
+                    return
+                self._write_snapshot(*job)
+            finally:
+                self._saver_idle.set()
+                self._save_queue.task_done()
+    
+    def _serialize_sessions(self) -> Optional[tuple]:
+        """Serialize all active sessions; returns (snapshot path, bytes) or None on error"""
+        try:
+            # Convert to serializable format, reusing dicts of sessions without new messages
             sessions_data = []
-            for session in self.active_sessions.values():
-                session_dict = asdict(session)
-                sessions_data.append(session_dict)
+            cache = {}
+            for session_id, session in self.active_sessions.items():
+                cached = self._session_dict_cache.get(session_id)
+                if cached is None or cached[0] != session.message_count:
+                    cached = (session.message_count, _session_to_dict(session))
+                cache[session_id] = cached
+                sessions_data.append(cached[1])
+            self._session_dict_cache = cache
             
             data = {
                 'sessions': sessions_data,
                 'last_updated': time.time()
             }
             
-            with open(self.sessions_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            if ormsgpack is not None:
+                # Binary snapshot: smaller on disk and faster to parse than JSON
+                return self.sessions_pack_file, ormsgpack.packb(data)
+            # UTF-8 bytes directly, so Bengali text needs no escaping
+            return self.sessions_file, _dumps(data, indent=True)
                 
         except Exception as e:
             self.logger.error(f"Error saving sessions: {e}")
+            return None
+    
+    def _write_snapshot(self, path: Path, blob: bytes):
+        """Atomically replace a snapshot file, then drop the journal it supersedes"""
+        try:
+            tmp_path = path.with_suffix(path.suffix + '.tmp')
+            tmp_path.write_bytes(blob)
+            os.replace(tmp_path, path)
+            self.rotated_journal_file.unlink(missing_ok=True)
+        except Exception as e:
+            self.logger.error(f"Error saving sessions: {e}")
+    
+    def _track_messages(self, messages: Iterable[ChatMessage], sign: int = 1):
+        """Add (sign=1) or remove (sign=-1) messages from the running global aggregates"""
+        for message in messages:
+            self._language_counts[message.language] += sign
+            self._confidence_sum += sign * message.confidence
+            self._message_total += sign
+    
+    def _drop_session(self, session_id: str) -> bool:
+        """Remove a session from memory and from the running aggregates"""
+        session = self.active_sessions.pop(session_id, None)
+        if session is None:
+            return False
+        self._track_messages(session.messages, -1)
+        return True
     
     def _cleanup_old_sessions(self):
-        """Remove old inactive sessions"""
+        """Remove old inactive sessions, oldest first"""
         current_time = time.time()
-        expired_sessions = []
-        
-        for session_id, session in self.active_sessions.items():
-            if current_time - session.last_activity > self.session_timeout:
-                expired_sessions.append(session_id)
-        
-        for session_id in expired_sessions:
-            del self.active_sessions[session_id]
+        expired = 0
+        
+        # Sessions are kept in access order, so stop at the first one still active
+        while self.active_sessions:
+            session_id, session = next(iter(self.active_sessions.items()))
+            if current_time - session.last_activity <= self.session_timeout:
+                break
+            self._drop_session(session_id)
+            expired += 1
             
-        if expired_sessions:
-            self.logger.info(f"Cleaned up {len(expired_sessions)} expired sessions")
+        if expired:
+            self.logger.info(f"Cleaned up {expired} expired sessions")
     
     def create_session(self) -> str:
         """Create a new chat session"""
@@ -126,7 +405,7 @@ class MemoryManager:
             session_id=session_id,
             created_at=current_time,
             last_activity=current_time,
-            messages=[],
+            messages=deque(maxlen=self.max_session_memory),
             message_count=0
         )
         
@@ -139,20 +418,35 @@ class MemoryManager:
         self.logger.info(f"Created new session: {session_id}")
         return session_id
     
-    def add_message(self, session_id: str, query: str, response: str, 
-                   language: str, confidence: float, sources: List[str]) -> bool:
-        """Add a message to a chat session"""
-        if session_id not in self.active_sessions:
-            # Create session if it doesn't exist
-            self.active_sessions[session_id] = ChatSession(
+    def _apply_message(self, session_id: str, message: ChatMessage):
+        """Append a message to its session in memory, creating the session if needed"""
+        message.language = _intern_language(message.language)
+        
+        session = self.active_sessions.get(session_id)
+        if session is None:
+            session = ChatSession(
                 session_id=session_id,
-                created_at=time.time(),
-                last_activity=time.time(),
-                messages=[],
+                created_at=message.timestamp,
+                last_activity=message.timestamp,
+                messages=deque(maxlen=self.max_session_memory),
                 message_count=0
             )
+            self.active_sessions[session_id] = session
+        else:
+            self.active_sessions.move_to_end(session_id)
         
-        session = self.active_sessions[session_id]
+        # The bounded deque drops the oldest message itself; keep the aggregates in step
+        if len(session.messages) == session.messages.maxlen:
+            self._track_messages((session.messages[0],), -1)
+        
+        session.messages.append(message)
+        session.message_count += 1
+        session.last_activity = message.timestamp
+        self._track_messages((message,))
+    
+    def add_message(self, session_id: str, query: str, response: str, 
+                   language: str, confidence: float, sources: List[str]) -> bool:
+        """Add a message to a chat session"""
         current_time = time.time()
         
         message = ChatMessage(
@@ -165,17 +459,10 @@ class MemoryManager:
             sources_used=sources
         )
         
-        session.messages.append(message)
-        session.message_count += 1
-        session.last_activity = current_time
-        
-        # Limit session memory
-        if len(session.messages) > self.max_session_memory:
-            session.messages = session.messages[-self.max_session_memory:]
+        self._apply_message(session_id, message)
         
-        # Periodically save sessions
-        if session.message_count % 5 == 0:
-            self._save_sessions()
+        # Append only the new message instead of rewriting every session
+        self._append_journal({'op': 'msg', 'ts': current_time, 'sid': session_id, 'msg': _message_to_dict(message)})
         
         return True
     
@@ -184,14 +471,20 @@ class MemoryManager:
         if session_id not in self.active_sessions:
             return []
         
+        # Reads leave last_activity alone, so the session keeps its place in the
+        # last_activity order that _cleanup_old_sessions relies on
         session = self.active_sessions[session_id]
-        return session.messages[-limit:] if session.messages else []
+        messages = session.messages
+        return list(islice(messages, max(len(messages) - limit, 0), None))
     
     def get_context_for_query(self, session_id: str, current_query: str, 
                              limit: int = 3) -> str:
         """Get contextual information from recent chat history"""
-        history = self.get_session_history(session_id, limit)
-        
+        return self._format_context(self.get_session_history(session_id, limit), limit)
+    
+    @staticmethod
+    def _format_context(history: List[ChatMessage], limit: int) -> str:
+        """Build the context string from the last `limit` messages of history"""
         if not history:
             return ""
         
@@ -204,6 +497,21 @@ class MemoryManager:
         context = "\n".join(context_parts)
         return context if len(context) < 500 else context[:500] + "..."
     
+    @contextmanager
+    def session(self, session_id: Optional[str] = None) -> Iterator["SessionMemory"]:
+        """
+        Resolve a session once for the duration of a request
+        
+        Args:
+            session_id: Existing session ID, or None to create a new session
+            
+        Yields:
+            SessionMemory handle for reading history and recording the exchange
+        """
+        if session_id is None:
+            session_id = self.create_session()
+        yield SessionMemory(self, session_id)
+    
     def get_session_stats(self, session_id: str) -> Dict[str, Any]:
         """Get statistics for a specific session"""
         if session_id not in self.active_sessions:
@@ -231,8 +539,8 @@ class MemoryManager:
         }
     
     def get_global_stats(self) -> Dict[str, Any]:
-        """Get global memory statistics"""
-        total_messages = sum(len(session.messages) for session in self.active_sessions.values())
+        """Get global memory statistics from the running aggregates"""
+        total_messages = self._message_total
         total_sessions = len(self.active_sessions)
         
         if total_messages == 0:
@@ -244,28 +552,18 @@ class MemoryManager:
                 'avg_global_confidence': 0
             }
         
-        languages_count = {}
-        total_confidence = 0
-        
-        for session in self.active_sessions.values():
-            for message in session.messages:
-                lang = message.language
-                languages_count[lang] = languages_count.get(lang, 0) + 1
-                total_confidence += message.confidence
-        
         return {
             'total_sessions': total_sessions,
             'total_messages': total_messages,
             'avg_messages_per_session': round(total_messages / total_sessions, 2),
-            'languages_distribution': languages_count,
-            'avg_global_confidence': round(total_confidence / total_messages, 3)
+            'languages_distribution': dict(+self._language_counts),
+            'avg_global_confidence': round(self._confidence_sum / total_messages, 3)
         }
     
     def clear_session(self, session_id: str) -> bool:
         """Clear a specific session"""
-        if session_id in self.active_sessions:
-            del self.active_sessions[session_id]
-            self._save_sessions()
+        if self._drop_session(session_id):
+            self._append_journal({'op': 'clear', 'ts': time.time(), 'sid': session_id}, flush=True)
             self.logger.info(f"Cleared session: {session_id}")
             return True
         return False
@@ -273,7 +571,7 @@ class MemoryManager:
     def save_and_cleanup(self):
         """Save all sessions and cleanup old ones"""
         self._cleanup_old_sessions()
-        self._save_sessions()
+        self._compact(background=False)
         self.logger.info("Memory saved and cleaned up")
     
     def get_fallback_response(self, query: str, language: str) -> Dict[str, Any]:
@@ -284,14 +582,14 @@ class MemoryManager:
                 "এই প্রশ্নের উত্তর আমার জানা নেই। অন্যভাবে জিজ্ঞাসা করুন।",
                 "আমি এই বিষয়ে তথ্য খুঁজে পাচ্ছি না। আরো স্পষ্ট প্রশ্ন করুন।"
             ]
-            answer = fallback_responses[hash(query) % len(fallback_responses)]
+            answer = fallback_responses[xxhash.xxh3_64_intdigest(query.encode('utf-8')) % len(fallback_responses)]
         else:
             fallback_responses = [
                 "I don't have knowledge about this. Please try asking more specifically.",
                 "I cannot find information about this. Please rephrase your question.",
                 "I don't have data on this topic. Try asking in a different way."
             ]
-            answer = fallback_responses[hash(query) % len(fallback_responses)]
+            answer = fallback_responses[xxhash.xxh3_64_intdigest(query.encode('utf-8')) % len(fallback_responses)]
         
         return {
             'answer': answer,
@@ -304,8 +602,50 @@ class MemoryManager:
         }
 
 
+class SessionMemory:
+    """
+    Per-request view of one session, obtained from MemoryManager.session
+    
+    Recent history is fetched once and reused for both the chat history and
+    the context string, instead of one session lookup per accessor.
+    """
+    
+    __slots__ = ('manager', 'session_id', '_history', '_history_limit')
+    
+    def __init__(self, manager: MemoryManager, session_id: str):
+        self.manager = manager
+        self.session_id = session_id
+        self._history: List[ChatMessage] = []
+        self._history_limit = -1
+    
+    def history(self, limit: int = 10) -> List[ChatMessage]:
+        """Recent messages, served from the already fetched window when it is large enough"""
+        if limit > self._history_limit:
+            self._history = self.manager.get_session_history(self.session_id, limit)
+            self._history_limit = limit
+            return self._history
+        return self._history[-limit:] if limit > 0 else []
+    
+    def context_for(self, current_query: str, limit: int = 3) -> str:
+        """Contextual information from recent chat history"""
+        return self.manager._format_context(self.history(limit), limit)
+    
+    def add(self, query: str, response: str, language: str,
+            confidence: float, sources: List[str]) -> bool:
+        """Record an exchange in this session"""
+        added = self.manager.add_message(self.session_id, query, response, language, confidence, sources)
+        # History changed, so the next read fetches it again
+        self._history_limit = -1
+        return added
+
+
+_manager_lock = threading.Lock()
+
+
 def get_memory_manager() -> MemoryManager:
-    """Get singleton instance of memory manager"""
+    """Get singleton instance of memory manager (safe to call from several threads)"""
     if not hasattr(get_memory_manager, '_instance'):
-        get_memory_manager._instance = MemoryManager()
+        with _manager_lock:
+            if not hasattr(get_memory_manager, '_instance'):
+                get_memory_manager._instance = MemoryManager()
     return get_memory_manager._instance
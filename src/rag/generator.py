@@ -1,11 +1,105 @@
 """
 Response generator using Gemini model
 """
-from typing import List, Dict, Any
+import asyncio
+import re
+import threading
+from collections import OrderedDict
+from operator import attrgetter
+from typing import List, Dict, Any, Callable, FrozenSet, Optional, Tuple
 import google.generativeai as genai
 from src.config.settings import get_settings
 from src.utils.logger import setup_logger
+from src.rag.retriever import RetrievedDoc
 
+_RELEVANCE = attrgetter('relevance_score')
+_DOCUMENT_ID = attrgetter('document_id')
+
+# Prompt templates, pre-split around the context and query so a prompt is one join.
+# The role and instructions lead so every prompt of a language and query type shares
+# one static prefix that the model-side prefix cache can reuse; per-turn content
+# (documents, then history, then the question) comes after it
+_BN_ROLE = "আপনি একজন বাংলা সাহিত্যের বিশেষজ্ঞ। নিম্নলিখিত তথ্যের ভিত্তিতে প্রশ্নের উত্তর দিন।"
+_BN_INSTRUCTIONS = """
+
+নির্দেশনা:
+- শুধুমাত্র প্রদত্ত তথ্যের ভিত্তিতে উত্তর দিন
+- উত্তর সংক্ষিপ্ত এবং সঠিক হতে হবে
+- তথ্য না জানলে বলুন "আমার এই বিষয়ে জ্ঞান নেই"
+- কোনো তথ্যসূত্র বা রেফারেন্স উল্লেখ করবেন না"""
+_BN_PREFIX = _BN_ROLE + _BN_INSTRUCTIONS + "\n\nতথ্য:\n"
+_BN_PREFIX_MCQ = _BN_ROLE + _BN_INSTRUCTIONS + "\n- বহুনির্বাচনী প্রশ্নের ক্ষেত্রে সঠিক উত্তর দিন" + "\n\nতথ্য:\n"
+_BN_HISTORY = "\n\nআগের কথোপকথন:\n"
+_BN_MID = "\n\nপ্রশ্ন: "
+_BN_SUFFIX = "\n\nউত্তর:"
+
+_EN_ROLE = "You are a helpful assistant specializing in Bengali literature. Answer the question based on the provided information."
+_EN_INSTRUCTIONS = """
+
+Instructions:
+- Answer based only on the information provided
+- Keep the answer concise and accurate
+- If you don't know something, say "I don't have knowledge about this"
+- Do not include any source references or citations"""
+_EN_PREFIX = _EN_ROLE + _EN_INSTRUCTIONS + "\n\nInformation:\n"
+_EN_PREFIX_MCQ = _EN_ROLE + _EN_INSTRUCTIONS + "\n- For multiple choice questions, provide the correct answer" + "\n\nInformation:\n"
+_EN_HISTORY = "\n\nPrevious conversation:\n"
+_EN_MID = "\n\nQuestion: "
+_EN_SUFFIX = "\n\nAnswer:"
+
+# Phrases that mark a question about the conversation itself
+_MEMORY_KEYWORDS = {
+    'bn': [
+        'আগের প্রশ্ন', 'শেষ প্রশ্ন', 'পূর্বের প্রশ্ন', 'আগে কী জিজ্ঞেস',
+        'আগে কি জিজ্ঞেস', 'আগের উত্তর', 'শেষ উত্তর', 'পূর্বের উত্তর',
+        'আমার আগের', 'আমার শেষ', 'আমার পূর্বের'
+    ],
+    'en': [
+        'my last query', 'my previous query', 'last question', 'previous question',
+        'what did i ask', 'what was my question', 'my last question',
+        'previous answer', 'last answer', 'what did you say', 'before'
+    ]
+}
+
+# Words that tell whether a memory query asks for the last question, the last answer, or both
+_MEMORY_CATEGORY_WORDS = {
+    'bn': {'question': ('প্রশ্ন', 'জিজ্ঞেস'), 'answer': ('উত্তর',)},
+    'en': {'question': ('question', 'query', 'ask'), 'answer': ('answer', 'response', 'say')}
+}
+_CATEGORY_BY_TAG = {'q': 'question', 'a': 'answer'}
+
+
+def _compile_memory_classifier(keywords: List[str], category_words: Dict[str, Tuple[str, ...]]) -> "re.Pattern":
+    """
+    Compile keywords and category words into one alternation
+    
+    Group names encode what a match means: 'k' marks a memory keyword and the
+    following letters the categories it implies ('kq', 'ka'); bare 'q'/'a'
+    groups are category words on their own. One finditer pass then decides
+    both whether the query is about memory and which branch to answer.
+    """
+    groups: Dict[str, List[str]] = {}
+    for keyword in keywords:
+        tag = 'k' + ''.join(
+            category[0] for category, words in category_words.items()
+            if any(word in keyword for word in words)
+        )
+        groups.setdefault(tag, []).append(keyword)
+    for category, words in category_words.items():
+        groups.setdefault(category[0], []).extend(words)
+    
+    # Keyword groups first, longest alternatives first, so keywords win over bare category words
+    ordered = sorted(groups.items(), key=lambda item: not item[0].startswith('k'))
+    return re.compile('|'.join(
+        f"(?P<{tag}>{'|'.join(sorted(map(re.escape, words), key=len, reverse=True))})"
+        for tag, words in ordered
+    ))
+
+
+_MEMORY_RES = {
+    language: _compile_memory_classifier(keywords, _MEMORY_CATEGORY_WORDS[language])
+    for language, keywords in _MEMORY_KEYWORDS.items()
+}
 
 class ResponseGenerator:
     """Generates responses using retrieved context and Gemini model"""
@@ -17,9 +111,18 @@ class ResponseGenerator:
         # Configure Gemini
         genai.configure(api_key=self.settings.google_api_key)
         self.model = genai.GenerativeModel(self.settings.gemini_model)
+        
+        # Upper bound on in-flight async Gemini calls
+        self.max_concurrent_requests = 32
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        
+        # LRU cache of generated answers for history-free prompts
+        self.response_cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self.response_cache_size = 1024
+        self._cache_lock = threading.Lock()
     
     def generate_response(self, query_data: Dict[str, Any], 
-                         retrieved_docs: List[Dict[str, Any]], 
+                         retrieved_docs: List[RetrievedDoc], 
                          chat_history: List = None) -> Dict[str, Any]:
         """
         Generate response based on query and retrieved documents
@@ -32,109 +135,191 @@ class ResponseGenerator:
         Returns:
             Generated response with metadata
         """
+        prompt, response = self._prepare_generation(query_data, retrieved_docs, chat_history)
+        if response is not None:
+            return response
+        
+        # Answers only depend on the prompt inputs when there is no chat history
+        cache_key = None if chat_history else self._response_cache_key(query_data, retrieved_docs)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return self._build_response(query_data, retrieved_docs, cached)
+        
+        try:
+            # Generate response using Gemini
+            result = self.model.generate_content(prompt)
+            self._cache_put(cache_key, result.text)
+            return self._build_response(query_data, retrieved_docs, result.text)
+            
+        except Exception as e:
+            self.logger.error(f"Error generating response: {e}")
+            return self._build_error_response(query_data, e)
+    
+    async def agenerate_response(self, query_data: Dict[str, Any], 
+                                retrieved_docs: List[RetrievedDoc], 
+                                chat_history: List = None,
+                                on_text: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        Async variant of generate_response; concurrent Gemini calls are bounded by a semaphore
+        
+        Args:
+            query_data: Processed query information
+            retrieved_docs: List of relevant documents
+            chat_history: Previous chat messages for context
+            on_text: Optional callback that receives the answer text piece by piece as
+                Gemini streams it; not called when no model call is made
+            
+        Returns:
+            Generated response with metadata
+        """
+        prompt, response = self._prepare_generation(query_data, retrieved_docs, chat_history)
+        if response is not None:
+            return response
+        
+        # Answers only depend on the prompt inputs when there is no chat history
+        cache_key = None if chat_history else self._response_cache_key(query_data, retrieved_docs)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return self._build_response(query_data, retrieved_docs, cached)
+        
+        try:
+            # Generate response using Gemini without blocking the event loop
+            async with self._semaphore:
+                if on_text is None:
+                    answer = (await self.model.generate_content_async(prompt)).text
+                else:
+                    parts = []
+                    async for chunk in await self.model.generate_content_async(prompt, stream=True):
+                        # Finish-reason and safety chunks carry no parts, and .text raises on them
+                        if not chunk.parts:
+                            continue
+                        text = chunk.text
+                        parts.append(text)
+                        on_text(text)
+                    answer = ''.join(parts)
+            self._cache_put(cache_key, answer)
+            return self._build_response(query_data, retrieved_docs, answer)
+            
+        except Exception as e:
+            self.logger.error(f"Error generating response: {e}")
+            return self._build_error_response(query_data, e)
+    
+    def _prepare_generation(self, query_data: Dict[str, Any], 
+                            retrieved_docs: List[RetrievedDoc], 
+                            chat_history: List = None) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Build the prompt, or a final response when no model call is needed
+        
+        Returns:
+            (prompt, None) when the model should be called, otherwise (None, response)
+        """
         # Check if this is a memory/history related query
-        if self._is_memory_query(query_data):
-            return self._handle_memory_query(query_data, chat_history)
+        memory_tags = self.classify_memory_query(query_data)
+        if memory_tags is not None:
+            return None, self.answer_memory_query(query_data, chat_history, memory_tags)
         
         if not retrieved_docs:
-            return self._generate_no_context_response(query_data)
+            return None, self._generate_no_context_response(query_data)
         
         # Prepare context from retrieved documents
         context = self._prepare_context(retrieved_docs)
         
-        # Add chat history context if available
-        if chat_history:
-            context = self._add_chat_context(context, chat_history, query_data['language'])
+        # Format chat history if available; it follows the documents in the prompt
+        history = self._format_chat_history(chat_history, query_data['language'])
         
         # Generate prompt based on query language and type
-        prompt = self._build_prompt(query_data, context)
+        return self._build_prompt(query_data, context, history), None
+    
+    def _response_cache_key(self, query_data: Dict[str, Any], 
+                            retrieved_docs: List[RetrievedDoc]) -> tuple:
+        """Key an answer by everything that shapes its prompt"""
+        return (
+            query_data['cleaned_query'],
+            query_data['language'],
+            query_data['query_type'],
+            tuple(sorted(doc.document_id for doc in retrieved_docs[:5]))
+        )
+    
+    def _cache_get(self, key: Optional[tuple]) -> Optional[str]:
+        """Look up a cached answer, refreshing its LRU position"""
+        if key is None:
+            return None
+        with self._cache_lock:
+            answer = self.response_cache.get(key)
+            if answer is not None:
+                self.response_cache.move_to_end(key)
+            return answer
+    
+    def _cache_put(self, key: Optional[tuple], answer: str) -> None:
+        """Store a generated answer, evicting the least recently used one when full"""
+        if key is None:
+            return
+        with self._cache_lock:
+            self.response_cache[key] = answer
+            self.response_cache.move_to_end(key)
+            if len(self.response_cache) > self.response_cache_size:
+                self.response_cache.popitem(last=False)
+    
+    def _build_response(self, query_data: Dict[str, Any], 
+                        retrieved_docs: List[RetrievedDoc], answer: str) -> Dict[str, Any]:
+        """Wrap a generated answer with response metadata"""
+        return {
+            'answer': answer,
+            'query': query_data['original_query'],
+            'language': query_data['language'],
+            'context_used': len(retrieved_docs),
+            'sources': [doc.document_id for doc in retrieved_docs[:3]],
+            'confidence': self._calculate_confidence(retrieved_docs)
+        }
+    
+    def _build_error_response(self, query_data: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Response returned when the model call fails"""
+        return {
+            'answer': self._get_error_message(query_data['language']),
+            'query': query_data['original_query'],
+            'language': query_data['language'],
+            'context_used': 0,
+            'sources': [],
+            'confidence': 0.0,
+            'error': str(error)
+        }
+    
+    def _prepare_context(self, retrieved_docs: List[RetrievedDoc]) -> str:
+        """
+        Prepare context string from the top retrieved documents
         
-        try:
-            # Generate response using Gemini
-            response = self.model.generate_content(prompt)
-            
-            return {
-                'answer': response.text,
-                'query': query_data['original_query'],
-                'language': query_data['language'],
-                'context_used': len(retrieved_docs),
-                'sources': [doc['document_id'] for doc in retrieved_docs[:3]],
-                'confidence': self._calculate_confidence(retrieved_docs)
-            }
-            
-        except Exception as e:
-            self.logger.error(f"Error generating response: {e}")
-            return {
-                'answer': self._get_error_message(query_data['language']),
-                'query': query_data['original_query'],
-                'language': query_data['language'],
-                'context_used': 0,
-                'sources': [],
-                'confidence': 0.0,
-                'error': str(e)
-            }
-    
-    def _prepare_context(self, retrieved_docs: List[Dict[str, Any]]) -> str:
-        """Prepare context string from retrieved documents"""
+        The top documents are laid out in document ID order rather than rank order,
+        so turns that retrieve the same set produce the same prompt prefix.
+        """
         context_parts = []
         
-        for doc in retrieved_docs[:5]:
-            text = doc['text'].strip()
+        for doc in sorted(retrieved_docs[:5], key=_DOCUMENT_ID):
+            text = doc.text.strip()
             if text:
                 context_parts.append(text)
         
         return "\n\n".join(context_parts)
     
-    def _build_prompt(self, query_data: Dict[str, Any], context: str) -> str:
+    def _build_prompt(self, query_data: Dict[str, Any], context: str, history: str = "") -> str:
         """Build appropriate prompt based on query language and type"""
         query = query_data['cleaned_query']
         language = query_data['language']
         query_type = query_data['query_type']
         
         if language == 'bn':
-            return self._build_bengali_prompt(query, context, query_type)
+            return self._build_bengali_prompt(query, context, history, query_type)
         else:
-            return self._build_english_prompt(query, context, query_type)
+            return self._build_english_prompt(query, context, history, query_type)
     
-    def _build_bengali_prompt(self, query: str, context: str, query_type: str) -> str:
+    def _build_bengali_prompt(self, query: str, context: str, history: str, query_type: str) -> str:
         """Build Bengali language prompt"""
-        base_prompt = f"""আপনি একজন বাংলা সাহিত্যের বিশেষজ্ঞ। নিম্নলিখিত তথ্যের ভিত্তিতে প্রশ্নের উত্তর দিন।
-
-তথ্য:
-{context}
-
-প্রশ্ন: {query}
-
-নির্দেশনা:
-- শুধুমাত্র প্রদত্ত তথ্যের ভিত্তিতে উত্তর দিন
-- উত্তর সংক্ষিপ্ত এবং সঠিক হতে হবে
-- তথ্য না জানলে বলুন "আমার এই বিষয়ে জ্ঞান নেই"
-- কোনো তথ্যসূত্র বা রেফারেন্স উল্লেখ করবেন না"""
-        
-        if query_type == 'mcq':
-            base_prompt += "\n- বহুনির্বাচনী প্রশ্নের ক্ষেত্রে সঠিক উত্তর দিন"
-        
-        return base_prompt + "\n\nউত্তর:"
+        prefix = _BN_PREFIX_MCQ if query_type == 'mcq' else _BN_PREFIX
+        return ''.join((prefix, context, history, _BN_MID, query, _BN_SUFFIX))
     
-    def _build_english_prompt(self, query: str, context: str, query_type: str) -> str:
+    def _build_english_prompt(self, query: str, context: str, history: str, query_type: str) -> str:
         """Build English language prompt"""
-        base_prompt = f"""You are a helpful assistant specializing in Bengali literature. Answer the question based on the provided information.
-
-Information:
-{context}
-
-Question: {query}
-
-Instructions:
-- Answer based only on the information provided
-- Keep the answer concise and accurate
-- If you don't know something, say "I don't have knowledge about this"
-- Do not include any source references or citations"""
-        
-        if query_type == 'mcq':
-            base_prompt += "\n- For multiple choice questions, provide the correct answer"
-        
-        return base_prompt + "\n\nAnswer:"
+        prefix = _EN_PREFIX_MCQ if query_type == 'mcq' else _EN_PREFIX
+        return ''.join((prefix, context, history, _EN_MID, query, _EN_SUFFIX))
     
     def _generate_no_context_response(self, query_data: Dict[str, Any]) -> Dict[str, Any]:
         """Generate response when no relevant context is found"""
@@ -154,14 +339,14 @@ Instructions:
             'confidence': 0.0
         }
     
-    def _calculate_confidence(self, retrieved_docs: List[Dict[str, Any]]) -> float:
+    def _calculate_confidence(self, retrieved_docs: List[RetrievedDoc]) -> float:
         """Calculate confidence score based on retrieved documents"""
         if not retrieved_docs:
             return 0.0
         
         # Average relevance score of top 3 documents
         top_docs = retrieved_docs[:3]
-        avg_relevance = sum(doc['relevance_score'] for doc in top_docs) / len(top_docs)
+        avg_relevance = sum(map(_RELEVANCE, top_docs)) / len(top_docs)
         
         return min(avg_relevance * 1.2, 1.0)  # Slight boost, cap at 1.0
     
@@ -172,28 +357,32 @@ Instructions:
         else:
             return "Sorry, there was an error generating the response. Please try again."
     
-    def _is_memory_query(self, query_data: Dict[str, Any]) -> bool:
-        """Check if the query is asking about conversation history"""
+    def classify_memory_query(self, query_data: Dict[str, Any]) -> Optional[FrozenSet[str]]:
+        """
+        Check if the query is asking about conversation history
+        
+        Returns:
+            None for ordinary queries, otherwise the matched categories
+            ('question', 'answer'; empty when the query asks for both)
+        """
         query = query_data['cleaned_query'].lower()
         language = query_data['language']
         
-        if language == 'bn':
-            memory_keywords = [
-                'আগের প্রশ্ন', 'শেষ প্রশ্ন', 'পূর্বের প্রশ্ন', 'আগে কী জিজ্ঞেস',
-                'আগে কি জিজ্ঞেস', 'আগের উত্তর', 'শেষ উত্তর', 'পূর্বের উত্তর',
-                'আমার আগের', 'আমার শেষ', 'আমার পূর্বের'
-            ]
-        else:
-            memory_keywords = [
-                'my last query', 'my previous query', 'last question', 'previous question',
-                'what did i ask', 'what was my question', 'my last question',
-                'previous answer', 'last answer', 'what did you say', 'before'
-            ]
+        pattern = _MEMORY_RES['bn'] if language == 'bn' else _MEMORY_RES['en']
+        is_memory = False
+        tags = set()
+        for match in pattern.finditer(query):
+            tag = match.lastgroup
+            if tag[0] == 'k':
+                is_memory = True
+                tag = tag[1:]
+            tags.update(_CATEGORY_BY_TAG[letter] for letter in tag)
         
-        return any(keyword in query for keyword in memory_keywords)
+        return frozenset(tags) if is_memory else None
     
-    def _handle_memory_query(self, query_data: Dict[str, Any], chat_history: List) -> Dict[str, Any]:
-        """Handle queries about conversation history"""
+    def answer_memory_query(self, query_data: Dict[str, Any], chat_history: List,
+                            tags: FrozenSet[str] = frozenset()) -> Dict[str, Any]:
+        """Handle queries about conversation history using the categories found by the classifier"""
         language = query_data['language']
         
         if not chat_history or len(chat_history) == 0:
@@ -206,16 +395,16 @@ Instructions:
             last_message = chat_history[-1]
             
             if language == 'bn':
-                if 'প্রশ্ন' in query_data['cleaned_query'] or 'জিজ্ঞেস' in query_data['cleaned_query']:
+                if 'question' in tags:
                     answer = f"আপনার শেষ প্রশ্ন ছিল: \"{last_message.query}\""
-                elif 'উত্তর' in query_data['cleaned_query']:
+                elif 'answer' in tags:
                     answer = f"আমার শেষ উত্তর ছিল: \"{last_message.response}\""
                 else:
                     answer = f"আপনার শেষ প্রশ্ন: \"{last_message.query}\"\nআমার উত্তর: \"{last_message.response}\""
             else:
-                if 'question' in query_data['cleaned_query'] or 'query' in query_data['cleaned_query'] or 'ask' in query_data['cleaned_query']:
+                if 'question' in tags:
                     answer = f"Your last question was: \"{last_message.query}\""
-                elif 'answer' in query_data['cleaned_query'] or 'response' in query_data['cleaned_query'] or 'say' in query_data['cleaned_query']:
+                elif 'answer' in tags:
                     answer = f"My last answer was: \"{last_message.response}\""
                 else:
                     answer = f"Your last question: \"{last_message.query}\"\nMy answer: \"{last_message.response}\""
@@ -230,23 +419,17 @@ Instructions:
             'memory_query': True
         }
     
-    def _add_chat_context(self, context: str, chat_history: List, language: str) -> str:
-        """Add chat history context to the document context"""
-        if not chat_history or len(chat_history) == 0:
-            return context
+    def _format_chat_history(self, chat_history: List, language: str) -> str:
+        """Format the last two chat turns as a prompt section, or '' without history"""
+        if not chat_history:
+            return ""
         
         # Get last 2 messages for context
-        recent_history = chat_history[-2:] if len(chat_history) >= 2 else chat_history
+        recent_history = chat_history[-2:]
         
         if language == 'bn':
-            chat_context = "আগের কথোপকথন:\n"
-        else:
-            chat_context = "Previous conversation:\n"
-        
-        for msg in recent_history:
-            if language == 'bn':
-                chat_context += f"প্রশ্ন: {msg.query}\nউত্তর: {msg.response}\n\n"
-            else:
-                chat_context += f"Q: {msg.query}\nA: {msg.response}\n\n"
+            turns = [f"প্রশ্ন: {msg.query}\nউত্তর: {msg.response}" for msg in recent_history]
+            return _BN_HISTORY + "\n\n".join(turns)
         
-        return chat_context + "প্রাসঙ্গিক তথ্য:\n" + context if language == 'bn' else chat_context + "Relevant information:\n" + context
+        turns = [f"Q: {msg.query}\nA: {msg.response}" for msg in recent_history]
+        return _EN_HISTORY + "\n\n".join(turns)
@@ -2,10 +2,31 @@
 Query processor for multilingual queries
 """
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List
 from src.config.settings import get_settings
 from src.utils.logger import setup_logger
 from src.knowledge_base.embedding_service import EmbeddingService
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.langdetect_fast import bengali_ratio
+
+
+# Question indicators per language and MCQ related terms, each compiled into
+# one alternation so classification is a single C-level scan per category
+_QUESTION_WORDS = {
+    'bn': ['কী', 'কি', 'কে', 'কোন', 'কার', 'কেন', 'কিভাবে', 'কখন', 'কোথায়'],
+    'en': ['what', 'who', 'when', 'where', 'why', 'how', 'which']
+}
+_MCQ_TERMS = ['অপশন', 'সঠিক উত্তর', 'option', 'correct answer', 'choose', 'select']
+
+_QUESTION_RES = {
+    language: re.compile('|'.join(map(re.escape, words)))
+    for language, words in _QUESTION_WORDS.items()
+}
+_MCQ_RE = re.compile('|'.join(map(re.escape, _MCQ_TERMS)))
+
+# Query cleaning patterns
+_WHITESPACE_RE = re.compile(r'\s+')
+_SPECIAL_CHARS_RE = re.compile(r'[^\u0980-\u09FF\w\s\?\।]')
 
 
 class QueryProcessor:
@@ -15,6 +36,11 @@ class QueryProcessor:
         self.settings = get_settings()
         self.logger = setup_logger(__name__)
         self.embedding_service = EmbeddingService()
+        self.embedding_cache = EmbeddingCache(
+            self.settings.DATA_DIR / "embedding_cache",
+            model=self.settings.embedding_model,
+            dimension=self.settings.embedding_dimension
+        )
     
     def process_query(self, query: str) -> Dict[str, Any]:
         """
@@ -26,15 +52,24 @@ class QueryProcessor:
         Returns:
             Dictionary containing processed query information
         """
+        return self.embed_query(self.analyze_query(query))
+    
+    def analyze_query(self, query: str) -> Dict[str, Any]:
+        """
+        Clean the query and detect its language and type without embedding it
+        
+        Args:
+            query: Raw user query
+            
+        Returns:
+            Query information without the 'embedding' entry
+        """
         # Clean the query
         cleaned_query = self._clean_query(query)
         
         # Detect language
         language = self._detect_language(cleaned_query)
         
-        # Generate query embedding
-        embedding = self.embedding_service.generate_query_embedding(cleaned_query)
-        
         # Determine query type
         query_type = self._classify_query_type(cleaned_query, language)
         
@@ -42,17 +77,64 @@ class QueryProcessor:
             'original_query': query,
             'cleaned_query': cleaned_query,
             'language': language,
-            'query_type': query_type,
-            'embedding': embedding
+            'query_type': query_type
         }
     
+    def embed_query(self, query_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add the query embedding to analyzed query information (in place)
+        
+        Args:
+            query_data: Output of analyze_query
+            
+        Returns:
+            The same dictionary with 'embedding' set
+        """
+        # Generate query embedding (or reuse a persisted one)
+        query_data['embedding'] = self.embedding_cache.get_or_compute(
+            query_data['cleaned_query'], self.embedding_service.generate_query_embedding
+        )
+        # EmbeddingService returns unit-length vectors (and caches them that way)
+        query_data['embedding_normalized'] = True
+        return query_data
+    
+    def process_queries(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """
+        Process many queries, embedding them together in batched requests
+        
+        Args:
+            queries: Raw user queries
+            
+        Returns:
+            Processed query information for each query, in input order
+        """
+        processed = [self.analyze_query(query) for query in queries]
+        
+        # Only embed the queries the persistent cache doesn't already hold
+        missing = []
+        for query_data in processed:
+            query_data['embedding'] = self.embedding_cache.get(query_data['cleaned_query'])
+            query_data['embedding_normalized'] = True
+            if query_data['embedding'] is None:
+                missing.append(query_data)
+        
+        if missing:
+            computed = self.embedding_service.generate_query_embeddings(
+                [query_data['cleaned_query'] for query_data in missing]
+            )
+            for query_data, embedding in zip(missing, computed):
+                self.embedding_cache.put(query_data['cleaned_query'], embedding)
+                query_data['embedding'] = embedding
+        
+        return processed
+    
     def _clean_query(self, query: str) -> str:
         """Clean and normalize the query"""
         # Remove extra whitespace
-        query = re.sub(r'\s+', ' ', query.strip())
+        query = _WHITESPACE_RE.sub(' ', query.strip())
         
         # Remove special characters but keep Bengali punctuation
-        query = re.sub(r'[^\u0980-\u09FF\w\s\?\।]', ' ', query)
+        query = _SPECIAL_CHARS_RE.sub(' ', query)
         
         return query
     
@@ -66,17 +148,8 @@ class QueryProcessor:
         Returns:
             Language code ('bn' for Bengali, 'en' for English)
         """
-        # Count Bengali characters (Unicode range for Bengali)
-        bengali_chars = len(re.findall(r'[\u0980-\u09FF]', query))
-        total_chars = len(re.findall(r'[^\s]', query))
-        
-        if total_chars == 0:
-            return 'en'
-        
-        bengali_ratio = bengali_chars / total_chars
-        
         # If more than 30% Bengali characters, consider it Bengali
-        return 'bn' if bengali_ratio > 0.3 else 'en'
+        return 'bn' if bengali_ratio(query) > 0.3 else 'en'
     
     def _classify_query_type(self, query: str, language: str) -> str:
         """
@@ -91,24 +164,13 @@ class QueryProcessor:
         """
         query_lower = query.lower()
         
-        # Bengali question indicators
-        bengali_question_words = ['কী', 'কি', 'কে', 'কোন', 'কার', 'কেন', 'কিভাবে', 'কখন', 'কোথায়']
-        
-        # English question indicators  
-        english_question_words = ['what', 'who', 'when', 'where', 'why', 'how', 'which']
-        
-        # MCQ related terms
-        mcq_terms = ['অপশন', 'সঠিক উত্তর', 'option', 'correct answer', 'choose', 'select']
-        
         # Check for MCQ type
-        for term in mcq_terms:
-            if term.lower() in query_lower:
-                return 'mcq'
+        if _MCQ_RE.search(query_lower):
+            return 'mcq'
         
         # Check for factual questions
-        question_words = bengali_question_words if language == 'bn' else english_question_words
-        for word in question_words:
-            if word.lower() in query_lower:
-                return 'factual'
+        question_re = _QUESTION_RES['bn'] if language == 'bn' else _QUESTION_RES['en']
+        if question_re.search(query_lower):
+            return 'factual'
         
         return 'general'
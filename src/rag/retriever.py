@@ -1,12 +1,36 @@
 """
 Document retriever for similarity-based search
 """
+import sys
+from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
+import numpy as np
 from src.config.settings import get_settings
 from src.utils.logger import setup_logger
 from src.knowledge_base.vector_store import VectorStore
 
 
+# Interned content types; the vector store interns the values it returns too
+_CT_MCQ = sys.intern('mcq')
+_CT_TEXT = sys.intern('text')
+
+# Multiplicative relevance boost per query type: (content type it favours, factor)
+_RELEVANCE_BOOSTS = {
+    'mcq': (_CT_MCQ, 1.3),        # Boost MCQ results for MCQ queries
+    'factual': (_CT_TEXT, 1.1),   # Slight boost for text content for factual queries
+}
+
+
+@dataclass(slots=True)
+class RetrievedDoc:
+    text: str
+    metadata: Dict[str, Any]
+    relevance_score: float
+    distance: float
+    document_id: str
+    rank: int
+
+
 class DocumentRetriever:
     """Handles document retrieval based on query similarity"""
     
@@ -16,7 +40,7 @@ class DocumentRetriever:
         self.vector_store = VectorStore()
     
     def retrieve_documents(self, query_data: Dict[str, Any], 
-                         k: int = 5) -> List[Dict[str, Any]]:
+                         k: int = 5) -> List[RetrievedDoc]:
         """
         Retrieve relevant documents based on query
         
@@ -37,7 +61,8 @@ class DocumentRetriever:
         search_results = self.vector_store.search(
             query_embedding=query_embedding,
             n_results=k,
-            content_type=content_type
+            content_type=content_type,
+            normalized=query_data.get('embedding_normalized', False)
         )
         
         # Rank and filter results
@@ -56,12 +81,12 @@ class DocumentRetriever:
             Content type filter or None for no filter
         """
         if query_type == 'mcq':
-            return 'mcq'
+            return _CT_MCQ
         # For factual and general queries, search all content types
         return None
     
     def _rank_results(self, search_results: Dict[str, Any], 
-                     query_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+                     query_data: Dict[str, Any]) -> List[RetrievedDoc]:
         """
         Rank and process search results
         
@@ -77,67 +102,44 @@ class DocumentRetriever:
         distances = search_results['distances']
         ids = search_results['ids']
         
-        ranked_results = []
-        
-        for i, (doc, metadata, distance, doc_id) in enumerate(
-            zip(documents, metadatas, distances, ids)
-        ):
-            # Calculate relevance score (lower distance = higher relevance)
-            relevance_score = 1.0 - distance if distance <= 1.0 else 0.0
-            
-            # Apply query-specific scoring adjustments
-            adjusted_score = self._adjust_relevance_score(
-                relevance_score, metadata, query_data
+        if not documents:
+            return []
+        
+        # Calculate relevance scores (lower distance = higher relevance) in one vector pass.
+        # The index uses inner-product distance (1 - cos); 1 - 2*distance = 2*cos - 1 keeps
+        # the scale the thresholds below and the confidence score were tuned on (the old
+        # squared-L2 1 - distance), clamped at 0 for cos < 0.5
+        dist = np.asarray(distances, dtype=np.float64)
+        scores = np.maximum(1.0 - 2.0 * dist, 0.0)
+        
+        # Apply query-specific scoring adjustments; a boost only changes the
+        # order when it applies to some but not all of the results
+        reordered = False
+        boost = _RELEVANCE_BOOSTS.get(query_data['query_type'])
+        if boost is not None:
+            boosted_type, factor = boost
+            mask = np.fromiter(
+                (metadata.get('content_type') == boosted_type for metadata in metadatas),
+                dtype=bool, count=len(metadatas)
             )
-            
-            result = {
-                'text': doc,
-                'metadata': metadata,
-                'relevance_score': adjusted_score,
-                'distance': distance,
-                'document_id': doc_id,
-                'rank': i + 1
-            }
-            
-            ranked_results.append(result)
+            scores[mask] *= factor
+            reordered = bool(mask.any()) and not bool(mask.all())
         
-        # Sort by adjusted relevance score
-        ranked_results.sort(key=lambda x: x['relevance_score'], reverse=True)
+        # Ensure scores don't exceed 1.0
+        np.minimum(scores, 1.0, out=scores)
         
         # Filter out low-relevance results
         min_relevance = 0.3
-        filtered_results = [
-            result for result in ranked_results 
-            if result['relevance_score'] >= min_relevance
+        if reordered:
+            # Sort by adjusted relevance score (stable, so ties keep search order)
+            order = [i for i in np.argsort(-scores, kind='stable').tolist() if scores[i] >= min_relevance]
+        else:
+            # The vector store returns results by ascending distance, so the scores are
+            # already descending and everything past the first low score is low too
+            below = scores < min_relevance
+            order = range(int(below.argmax()) if below.any() else len(scores))
+        
+        return [
+            RetrievedDoc(documents[i], metadatas[i], float(scores[i]), distances[i], ids[i], i + 1)
+            for i in order
         ]
-        
-        return filtered_results
-    
-    def _adjust_relevance_score(self, base_score: float, 
-                               metadata: Dict[str, Any],
-                               query_data: Dict[str, Any]) -> float:
-        """
-        Adjust relevance score based on metadata and query characteristics
-        
-        Args:
-            base_score: Base relevance score from similarity
-            metadata: Document metadata
-            query_data: Query information
-            
-        Returns:
-            Adjusted relevance score
-        """
-        adjusted_score = base_score
-        
-        # Boost MCQ results for MCQ queries
-        if (query_data['query_type'] == 'mcq' and 
-            metadata.get('content_type') == 'mcq'):
-            adjusted_score *= 1.3
-        
-        # Slight boost for text content for factual queries
-        if (query_data['query_type'] == 'factual' and 
-            metadata.get('content_type') == 'text'):
-            adjusted_score *= 1.1
-        
-        # Ensure score doesn't exceed 1.0
-        return min(adjusted_score, 1.0)
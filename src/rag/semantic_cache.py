@@ -0,0 +1,94 @@
+"""
+Semantic cache that matches queries by embedding similarity
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+
+class SemanticCache:
+    """
+    Bounded LRU of values looked up by cosine similarity of query embeddings
+    
+    Entries live in buckets (e.g. language, query type, k) and only match
+    queries of the same bucket. Each bucket's embeddings are stacked into one
+    matrix on the first lookup after a change, so a lookup is a single
+    matrix-vector product. Embeddings must be L2-normalized.
+    """
+    
+    def __init__(self, max_size: int = 1024, threshold: float = 0.93):
+        """
+        Args:
+            max_size: Maximum number of entries across all buckets
+            threshold: Minimum cosine similarity for a hit
+        """
+        self.max_size = max_size
+        self.threshold = threshold
+        
+        self._entries: "OrderedDict[Tuple[Hashable, str], Tuple[np.ndarray, Any]]" = OrderedDict()
+        self._index: Dict[Hashable, Tuple[np.ndarray, List[Tuple[Hashable, str]]]] = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, bucket: Hashable, embedding: np.ndarray) -> Optional[Any]:
+        """
+        Find the value stored under the most similar embedding in a bucket
+        
+        Args:
+            bucket: Bucket to search
+            embedding: L2-normalized query embedding
+            
+        Returns:
+            The cached value, or None when nothing reaches the threshold
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        
+        with self._lock:
+            index = self._index.get(bucket)
+            if index is None:
+                keys = [key for key in self._entries if key[0] == bucket]
+                if not keys:
+                    return None
+                matrix = np.stack([self._entries[key][0] for key in keys])
+                index = self._index[bucket] = (matrix, keys)
+            
+            # Embeddings are unit length, so one matrix-vector product gives cosine similarities
+            matrix, keys = index
+            scores = matrix @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            
+            key = keys[best]
+            self._entries.move_to_end(key)
+            return self._entries[key][1]
+    
+    def put(self, bucket: Hashable, text: str, embedding: np.ndarray, value: Any):
+        """
+        Store a value under its query text and embedding, evicting the least recently used entry
+        
+        Args:
+            bucket: Bucket the entry belongs to
+            text: Normalized query text; a repeated text replaces the earlier entry
+            embedding: L2-normalized query embedding
+            value: Value to cache
+        """
+        key = (bucket, text)
+        embedding = np.asarray(embedding, dtype=np.float32)
+        
+        with self._lock:
+            self._entries[key] = (embedding, value)
+            self._entries.move_to_end(key)
+            self._index.pop(bucket, None)
+            if len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self._index.pop(evicted[0], None)
+    
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
@@ -3,5 +3,9 @@ Utility functions for the Multilingual RAG System
 """
 
 from .logger import setup_logger, get_logger
+from .hashing import hash_bytes, hash_text
 
-__all__ = ["setup_logger", "get_logger"]
+# embedding_cache and langdetect_fast pull in numpy/numba; import them from their
+# own modules so that importing the logger stays cheap
+
+__all__ = ["setup_logger", "get_logger", "hash_bytes", "hash_text"]
@@ -0,0 +1,103 @@
+"""
+Persistent on-disk cache for query embeddings
+Lets repeated queries skip the embedding API call, including across restarts
+"""
+
+import atexit
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Callable, Optional
+import numpy as np
+from .hashing import hash_text
+from .logger import setup_logger
+
+
+class EmbeddingCache:
+    """Content-addressed store of float32 embedding vectors backed by SQLite"""
+    
+    def __init__(self, cache_dir: Path, model: str, dimension: int):
+        """
+        Args:
+            cache_dir: Directory holding the cache database
+            model: Embedding model name; part of every key so a model swap invalidates entries
+            dimension: Embedding dimension; part of every key for the same reason
+        """
+        self.logger = setup_logger(__name__)
+        self.namespace = f"{model}:{dimension}"
+        self._lock = threading.Lock()
+        self._db = None
+        
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            # Lookups come from executor threads; the lock serializes all access
+            self._db = sqlite3.connect(
+                str(cache_dir / "query_embeddings.sqlite3"),
+                check_same_thread=False,
+                isolation_level=None
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            atexit.register(self.close)
+        except Exception as e:
+            # Unwritable or corrupt cache; run without it
+            self.logger.warning(f"Embedding cache disabled: {e}")
+    
+    def _key(self, text: str) -> str:
+        """Hash the NFC-normalized text together with the model namespace"""
+        return hash_text(f"{self.namespace}\0{unicodedata.normalize('NFC', text)}")
+    
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for text, or None on a miss"""
+        if self._db is None:
+            return None
+        
+        key = self._key(text)
+        try:
+            with self._lock:
+                if self._db is None:
+                    return None
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            # A broken cache must not fail the query; treat it as a miss
+            self.logger.warning(f"Embedding cache read failed: {e}")
+            return None
+        return None if row is None else np.frombuffer(row[0], dtype=np.float32)
+    
+    def put(self, text: str, embedding: np.ndarray):
+        """Store an embedding; zero vectors (failed requests) are not cached"""
+        if self._db is None or not embedding.any():
+            return
+        
+        key = self._key(text)
+        blob = np.asarray(embedding, dtype=np.float32).tobytes()
+        try:
+            with self._lock:
+                if self._db is not None:
+                    self._db.execute("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", (key, blob))
+        except sqlite3.Error as e:
+            self.logger.warning(f"Embedding cache write failed: {e}")
+    
+    def get_or_compute(self, text: str, compute: Callable[[str], np.ndarray]) -> np.ndarray:
+        """
+        Return the cached embedding for text, computing and storing it on a miss
+        
+        Args:
+            text: Text to embed
+            compute: Function producing the embedding for text
+        
+        Returns:
+            float32 embedding vector
+        """
+        embedding = self.get(text)
+        if embedding is None:
+            embedding = compute(text)
+            self.put(text, embedding)
+        return embedding
+    
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,32 @@
+"""
+Fast, non-cryptographic hashing helpers for cache keys
+"""
+
+import blake3
+import xxhash
+
+
+def hash_bytes(data: bytes) -> str:
+    """
+    Hash binary payloads (page images, embedding blobs) for use as cache keys
+
+    Args:
+        data: Raw bytes to hash
+
+    Returns:
+        Hex digest of the BLAKE3 hash
+    """
+    return blake3.blake3(data).hexdigest()
+
+
+def hash_text(text: str) -> str:
+    """
+    Hash text (chunks, queries) for use as cache keys
+
+    Args:
+        text: Text to hash
+
+    Returns:
+        Hex digest of the 128-bit XXH3 hash of the UTF-8 encoded text
+    """
+    return xxhash.xxh3_128(text.encode("utf-8")).hexdigest()
@@ -0,0 +1,61 @@
+"""
+Fast Bengali character ratio used for query language detection
+Uses a numba-compiled counting loop when numba is installed, NumPy otherwise
+"""
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # pragma: no cover - optional speedup
+    numba = None
+
+
+# Code points str.isspace() accepts (none lie above U+3000), i.e. what regex \s matches
+_WHITESPACE_CODES = np.array([c for c in range(0x3001) if chr(c).isspace()], dtype=np.uint32)
+
+
+def _count_numpy(codes: np.ndarray):
+    """Return (bengali, non-whitespace) counts with vectorized comparisons"""
+    total = codes.size - int(np.count_nonzero(np.isin(codes, _WHITESPACE_CODES)))
+    bengali = int(np.count_nonzero((codes >= 0x0980) & (codes <= 0x09FF)))
+    return bengali, total
+
+
+if numba is not None:
+    @numba.njit(cache=True, nogil=True)
+    def _count_codes(codes):
+        """Return (bengali, non-whitespace) counts in one loop over the code points"""
+        bengali = 0
+        total = 0
+        for c in codes:
+            if 0x0980 <= c <= 0x09FF:
+                bengali += 1
+                total += 1
+            elif not (
+                (0x09 <= c <= 0x0D) or (0x1C <= c <= 0x20) or c == 0x85 or c == 0xA0
+                or c == 0x1680 or (0x2000 <= c <= 0x200A) or c == 0x2028 or c == 0x2029
+                or c == 0x202F or c == 0x205F or c == 0x3000
+            ):
+                total += 1
+        return bengali, total
+else:
+    _count_codes = _count_numpy
+
+
+def bengali_ratio(text: str) -> float:
+    """
+    Fraction of non-whitespace characters that are Bengali (U+0980-U+09FF)
+    
+    Args:
+        text: Text to inspect
+    
+    Returns:
+        Ratio in [0, 1]; 0.0 for empty or whitespace-only text
+    """
+    # Zero-copy UTF-32 view of the code points
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    bengali_chars, total_chars = _count_codes(codes)
+    if total_chars == 0:
+        return 0.0
+    return bengali_chars / total_chars
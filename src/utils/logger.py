@@ -3,12 +3,20 @@ Logging configuration for the Multilingual RAG System
 Provides structured logging with color output and file logging
 """
 
+import functools
 import logging
 import sys
+import time
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Optional
 import colorlog
 
+# None of the formats use process/thread fields, so skip looking them up per record
+logging.logProcesses = False
+logging.logThreads = False
+logging.logMultiprocessing = False
+
 # Global logger cache
 _loggers = {}
 
@@ -31,8 +39,9 @@ def setup_logger(
     Returns:
         Configured logger instance
     """
-    if name in _loggers:
-        return _loggers[name]
+    logger = _loggers.get(name)
+    if logger is not None:
+        return logger
     
     logger = logging.getLogger(name)
     logger.setLevel(getattr(logging, level.upper()))
@@ -44,22 +53,33 @@ def setup_logger(
     if format_string is None:
         format_string = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     
-    # Console handler with colors
-    console_handler = colorlog.StreamHandler(sys.stdout)
-    console_formatter = colorlog.ColoredFormatter(
-        fmt="%(log_color)s%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
-        log_colors={
-            'DEBUG': 'cyan',
-            'INFO': 'green',
-            'WARNING': 'yellow',
-            'ERROR': 'red',
-            'CRITICAL': 'red,bg_white',
-        }
-    )
+    # Console handler with colors when attached to a terminal; plain text when
+    # stdout is piped to a file or journal, where ANSI codes are just noise
+    if sys.stdout.isatty():
+        console_handler = colorlog.StreamHandler(sys.stdout)
+        console_formatter = colorlog.ColoredFormatter(
+            fmt="%(log_color)s%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S",
+            log_colors={
+                'DEBUG': 'cyan',
+                'INFO': 'green',
+                'WARNING': 'yellow',
+                'ERROR': 'red',
+                'CRITICAL': 'red,bg_white',
+            }
+        )
+    else:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_formatter = logging.Formatter(
+            fmt=format_string,
+            datefmt="%Y-%m-%d %H:%M:%S"
+        )
     console_handler.setFormatter(console_formatter)
     logger.addHandler(console_handler)
     
+    # Handlers are attached here, so don't format the record again in ancestors
+    logger.propagate = False
+    
     # File handler (if log file specified)
     if log_file:
         # Create log directory if it doesn't exist
@@ -89,12 +109,14 @@ def get_logger(name: str) -> logging.Logger:
     Returns:
         Logger instance
     """
-    if name in _loggers:
-        return _loggers[name]
+    logger = _loggers.get(name)
+    if logger is not None:
+        return logger
     
-    # Import settings here to avoid circular imports
-    from ..config.settings import Settings
-    settings = Settings()
+    # Import settings here to avoid circular imports; the singleton avoids
+    # re-reading the environment for every new logger
+    from ..config.settings import get_settings
+    settings = get_settings()
     
     return setup_logger(
         name=name,
@@ -110,38 +132,56 @@ class LoggerMixin:
     
     @property
     def logger(self) -> logging.Logger:
-        """Get logger for this class"""
-        return get_logger(self.__class__.__name__)
+        """Get logger for this class (looked up once per instance)"""
+        try:
+            return self._cached_logger
+        except AttributeError:
+            self._cached_logger = get_logger(self.__class__.__name__)
+            return self._cached_logger
 
 
 def log_function_call(func):
     """
     Decorator to log function calls with parameters and execution time
+    
+    Argument formatting and timing only happen while DEBUG is enabled for
+    the function's module; failures are always logged.
     """
-    import functools
-    import time
+    func_name = func.__name__
+    logger = None
     
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        logger = get_logger(func.__module__)
-        start_time = time.time()
+        nonlocal logger
+        if logger is None:
+            logger = get_logger(func.__module__)
+        
+        if not logger.isEnabledFor(logging.DEBUG):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"{func_name} failed: {e}")
+                raise
+        
+        start_time = time.perf_counter()
         
         # Log function entry
-        logger.debug(f"Calling {func.__name__} with args={args}, kwargs={kwargs}")
+        logger.debug(f"Calling {func_name} with args={args}, kwargs={kwargs}")
         
         try:
             result = func(*args, **kwargs)
-            execution_time = time.time() - start_time
-            logger.debug(f"{func.__name__} completed in {execution_time:.3f}s")
+            execution_time = time.perf_counter() - start_time
+            logger.debug(f"{func_name} completed in {execution_time:.3f}s")
             return result
         except Exception as e:
-            execution_time = time.time() - start_time
-            logger.error(f"{func.__name__} failed after {execution_time:.3f}s: {e}")
+            execution_time = time.perf_counter() - start_time
+            logger.error(f"{func_name} failed after {execution_time:.3f}s: {e}")
             raise
     
     return wrapper
 
 
+@contextmanager
 def log_performance(operation_name: str):
     """
     Context manager to log performance of code blocks
@@ -151,22 +191,15 @@ def log_performance(operation_name: str):
             # Your code here
             pass
     """
-    import time
-    from contextlib import contextmanager
-    
-    @contextmanager
-    def _log_performance():
-        logger = get_logger("performance")
-        start_time = time.time()
-        logger.info(f"Starting {operation_name}")
-        
-        try:
-            yield
-            execution_time = time.time() - start_time
-            logger.info(f"Completed {operation_name} in {execution_time:.3f}s")
-        except Exception as e:
-            execution_time = time.time() - start_time
-            logger.error(f"Failed {operation_name} after {execution_time:.3f}s: {e}")
-            raise
-    
-    return _log_performance()
+    logger = get_logger("performance")
+    start_time = time.perf_counter()
+    logger.info(f"Starting {operation_name}")
+    
+    try:
+        yield
+        execution_time = time.perf_counter() - start_time
+        logger.info(f"Completed {operation_name} in {execution_time:.3f}s")
+    except Exception as e:
+        execution_time = time.perf_counter() - start_time
+        logger.error(f"Failed {operation_name} after {execution_time:.3f}s: {e}")
+        raise
@@ -2,13 +2,19 @@
 """
 Quick start script for the Multilingual RAG API
 """
+import argparse
 import os
 import sys
-import subprocess
 from pathlib import Path
+import uvicorn
 
 def main():
     """Start the RAG API server"""
+    parser = argparse.ArgumentParser(description="Start the Multilingual RAG API server")
+    parser.add_argument("--dev", action="store_true",
+                        help="Enable auto-reload on code changes")
+    args = parser.parse_args()
+    
     print("MULTILINGUAL RAG SYSTEM - API SERVER")
     print("=" * 50)
     print("Starting the API server...")
@@ -30,17 +36,23 @@ def main():
     
     project_root = Path(__file__).parent.absolute()
     
-    env = os.environ.copy()
-    env['PYTHONPATH'] = str(project_root)
+    # Serve in-process; uvloop and httptools are picked up automatically when installed
+    os.chdir(project_root)
+    if str(project_root) not in sys.path:
+        sys.path.insert(0, str(project_root))
     
     try:
-        subprocess.run([
-            sys.executable, "-m", "uvicorn", 
-            "app:app", 
-            "--host", "0.0.0.0", 
-            "--port", "8000", 
-            "--reload"
-        ], cwd=project_root, env=env)
+        uvicorn.run(
+            "app:app",
+            host="0.0.0.0",
+            port=8000,
+            reload=args.dev,
+            # Sessions and the chat journal live in-process; several workers would
+            # split sessions and race on memory/chat_journal.ndjson
+            workers=1,
+            loop="auto",
+            http="auto"
+        )
     except KeyboardInterrupt:
         print("\nServer stopped by user")
     except Exception as e: